@@ -0,0 +1,391 @@
+"""
+B+ tree as an alternative to the binary search tree of 5_bst.py
+
+A binary tree chases one node object per level, so a lookup in a
+tree of n keys touches ~log2(n) scattered objects. A B+ tree packs
+up to `fanout` keys per node, so the height drops to ~log_fanout(n)
+and every step is a binary search inside one contiguous list.
+
+- Internal nodes only hold separator keys and children. keys[i] is
+    a lower bound for every key under children[i + 1] and an
+    upper bound (exclusive) for every key under children[i]
+- All keys live in the leaves, and leaves are linked with next
+    and prev pointers so range scans are a sequential leaf walk
+- Every node other than the root stays at least half full, which
+    keeps the height O(log_fanout n) through deletes as well
+"""
+import importlib
+import random
+import time
+from bisect import bisect_left, bisect_right
+
+
+class Leaf:
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.next = None
+        self.prev = None
+
+
+class Internal:
+
+    def __init__(self, keys, children):
+        self.keys = keys
+        self.children = children
+
+
+class BPlusTree:
+
+    def __init__(self, fanout=64):
+        if fanout < 3:
+            raise Exception("Fanout of a B+ tree must be at least 3!")
+        self.fanout = fanout
+        self.min_keys = fanout // 2
+        self.min_children = (fanout + 1) // 2
+        self.root = Leaf([])
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _find_leaf(self, val):
+        """
+        Descends to the leaf which would hold val. Returns the
+        leaf and the path of (internal node, child index) taken
+        """
+        path = []
+        node = self.root
+        while isinstance(node, Internal):
+            i = bisect_right(node.keys, val)
+            path.append((node, i))
+            node = node.children[i]
+        return node, path
+
+    def search(self, val):
+        """
+        Returns val if it is present in the tree, None otherwise
+        """
+        leaf, _ = self._find_leaf(val)
+        i = bisect_left(leaf.keys, val)
+        if i < len(leaf.keys) and leaf.keys[i] == val:
+            return val
+        return None
+
+    def successor(self, val):
+        """
+        Returns the smallest key greater than val, None if there is
+        none. val need not be present in the tree
+        """
+        leaf, _ = self._find_leaf(val)
+        i = bisect_right(leaf.keys, val)
+        while leaf is not None and i >= len(leaf.keys):
+            # successor is the first key of the next non empty leaf
+            leaf = leaf.next
+            i = 0
+        if leaf is None:
+            return None
+        return leaf.keys[i]
+
+    def predecessor(self, val):
+        """
+        Returns the largest key smaller than val, None if there is
+        none. val need not be present in the tree
+        """
+        leaf, _ = self._find_leaf(val)
+        i = bisect_left(leaf.keys, val) - 1
+        while leaf is not None and i < 0:
+            leaf = leaf.prev
+            if leaf is not None:
+                i = len(leaf.keys) - 1
+        if leaf is None:
+            return None
+        return leaf.keys[i]
+
+    def min(self):
+        node = self.root
+        while isinstance(node, Internal):
+            node = node.children[0]
+        if not node.keys:
+            return None
+        return node.keys[0]
+
+    def max(self):
+        node = self.root
+        while isinstance(node, Internal):
+            node = node.children[-1]
+        if not node.keys:
+            return None
+        return node.keys[-1]
+
+    def insert(self, val):
+        """
+        Inserts val in its leaf. An overflowing node is split in two
+        halves and the split propagates upwards, growing a new root
+        when the old root splits. Duplicates are ignored
+        """
+        leaf, path = self._find_leaf(val)
+        i = bisect_left(leaf.keys, val)
+        if i < len(leaf.keys) and leaf.keys[i] == val:
+            return False
+
+        leaf.keys.insert(i, val)
+        self.size = self.size + 1
+        if len(leaf.keys) <= self.fanout:
+            return True
+
+        # split the leaf, the first key of the right half
+        # becomes the separator in the parent
+        mid = len(leaf.keys) // 2
+        right = Leaf(leaf.keys[mid:])
+        leaf.keys = leaf.keys[:mid]
+        right.next = leaf.next
+        right.prev = leaf
+        if leaf.next is not None:
+            leaf.next.prev = right
+        leaf.next = right
+        separator = right.keys[0]
+
+        while path:
+            parent, i = path.pop()
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, right)
+            if len(parent.children) <= self.fanout:
+                return True
+
+            # split the internal node, the middle separator
+            # moves up instead of being copied
+            mid = len(parent.keys) // 2
+            separator = parent.keys[mid]
+            right = Internal(parent.keys[mid + 1:],
+                             parent.children[mid + 1:])
+            parent.keys = parent.keys[:mid]
+            parent.children = parent.children[:mid + 1]
+
+        self.root = Internal([separator], [self.root, right])
+        return True
+
+    def delete(self, val):
+        """
+        Removes val from its leaf. An underflowing node first tries
+        to borrow a key from a sibling and otherwise merges with it,
+        which may make its parent underflow in turn
+        """
+        leaf, path = self._find_leaf(val)
+        i = bisect_left(leaf.keys, val)
+        if i >= len(leaf.keys) or leaf.keys[i] != val:
+            raise Exception("Node to be deleted is not found!")
+
+        del leaf.keys[i]
+        self.size = self.size - 1
+
+        node = leaf
+        while path and self._underflows(node):
+            parent, i = path.pop()
+            if isinstance(node, Leaf):
+                self._fix_leaf(parent, i)
+            else:
+                self._fix_internal(parent, i)
+            node = parent
+
+        if isinstance(self.root, Internal) and \
+                len(self.root.children) == 1:
+            # root lost its last separator, tree shrinks by a level
+            self.root = self.root.children[0]
+
+    def _underflows(self, node):
+        if isinstance(node, Leaf):
+            return len(node.keys) < self.min_keys
+        return len(node.children) < self.min_children
+
+    def _fix_leaf(self, parent, i):
+        leaf = parent.children[i]
+        left = parent.children[i - 1] if i > 0 else None
+        right = parent.children[i + 1] \
+            if i + 1 < len(parent.children) else None
+
+        if left is not None and len(left.keys) > self.min_keys:
+            # borrow the max key of the left sibling
+            leaf.keys.insert(0, left.keys.pop())
+            parent.keys[i - 1] = leaf.keys[0]
+        elif right is not None and len(right.keys) > self.min_keys:
+            # borrow the min key of the right sibling
+            leaf.keys.append(right.keys.pop(0))
+            parent.keys[i] = right.keys[0]
+        elif left is not None:
+            # merge into the left sibling
+            left.keys.extend(leaf.keys)
+            self._unlink_leaf(leaf)
+            del parent.keys[i - 1]
+            del parent.children[i]
+        else:
+            # merge the right sibling into this leaf
+            leaf.keys.extend(right.keys)
+            self._unlink_leaf(right)
+            del parent.keys[i]
+            del parent.children[i + 1]
+
+    @staticmethod
+    def _unlink_leaf(leaf):
+        if leaf.prev is not None:
+            leaf.prev.next = leaf.next
+        if leaf.next is not None:
+            leaf.next.prev = leaf.prev
+
+    def _fix_internal(self, parent, i):
+        node = parent.children[i]
+        left = parent.children[i - 1] if i > 0 else None
+        right = parent.children[i + 1] \
+            if i + 1 < len(parent.children) else None
+
+        if left is not None and len(left.children) > self.min_children:
+            # rotate through the parent separator
+            node.keys.insert(0, parent.keys[i - 1])
+            node.children.insert(0, left.children.pop())
+            parent.keys[i - 1] = left.keys.pop()
+        elif right is not None and \
+                len(right.children) > self.min_children:
+            node.keys.append(parent.keys[i])
+            node.children.append(right.children.pop(0))
+            parent.keys[i] = right.keys.pop(0)
+        elif left is not None:
+            # pull the separator down and merge into the left sibling
+            left.keys.append(parent.keys[i - 1])
+            left.keys.extend(node.keys)
+            left.children.extend(node.children)
+            del parent.keys[i - 1]
+            del parent.children[i]
+        else:
+            node.keys.append(parent.keys[i])
+            node.keys.extend(right.keys)
+            node.children.extend(right.children)
+            del parent.keys[i]
+            del parent.children[i + 1]
+
+    def iter_range(self, lo, hi):
+        """
+        Yields keys in the closed range [lo, hi] in sorted order.
+        One descent to the leaf of lo and then a sequential walk
+        over the linked leaves
+        """
+        leaf, _ = self._find_leaf(lo)
+        i = bisect_left(leaf.keys, lo)
+        while leaf is not None:
+            keys = leaf.keys
+            while i < len(keys):
+                if keys[i] > hi:
+                    return
+                yield keys[i]
+                i = i + 1
+            leaf = leaf.next
+            i = 0
+
+    def range_search(self, lo, hi):
+        """
+        Returns list of keys in the closed range [lo, hi]
+        """
+        return list(self.iter_range(lo, hi))
+
+    def height(self):
+        h = 0
+        node = self.root
+        while isinstance(node, Internal):
+            node = node.children[0]
+            h = h + 1
+        return h
+
+    def inorder_traversal(self):
+        node = self.root
+        while isinstance(node, Internal):
+            node = node.children[0]
+        while node is not None:
+            for key in node.keys:
+                print(key, end=" ")
+            node = node.next
+
+
+def benchmark(n, fanout=64, lookups=100000, scans=1000, scan_length=1000):
+    """
+    Compares the B+ tree against the binary tree of 5_bst.py on the
+    same n random keys for a lookup heavy workload (random search)
+    and a scan heavy workload (range scans of scan_length keys)
+    """
+    bst = importlib.import_module("5_bst")
+    keys = random.sample(range(n * 10), n)
+
+    binary_tree = bst.build_bst(keys)
+    bplus_tree = BPlusTree(fanout)
+    for k in keys:
+        bplus_tree.insert(k)
+
+    probes = [random.choice(keys) for _ in range(lookups)]
+    sorted_keys = sorted(keys)
+    starts = [sorted_keys[random.randrange(max(1, n - scan_length))]
+              for _ in range(scans)]
+
+    start = time.perf_counter()
+    for p in probes:
+        binary_tree.search(p)
+    bst_lookup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p in probes:
+        bplus_tree.search(p)
+    bplus_lookup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for s in starts:
+        for _ in zip(range(scan_length), binary_tree.iter_inorder(lo=s)):
+            pass
+    bst_scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for s in starts:
+        scan = bplus_tree.iter_range(s, float("inf"))
+        for _ in zip(range(scan_length), scan):
+            pass
+    bplus_scan = time.perf_counter() - start
+
+    print("Keys=", n, "fanout=", fanout,
+          "B+ tree height=", bplus_tree.height())
+    print("Lookups: binary tree %.2f us, B+ tree %.2f us"
+          % (bst_lookup * 1e6 / lookups, bplus_lookup * 1e6 / lookups))
+    print("Scans of %d keys: binary tree %.1f us, B+ tree %.1f us"
+          % (scan_length, bst_scan * 1e6 / scans, bplus_scan * 1e6 / scans))
+
+
+def capture_inputs():
+    raw = input()
+    return [int(r) for r in raw.split()]
+
+
+def main():
+    print("Enter the fanout of the tree=", end="")
+    fanout = int(input())
+    print("Enter elements to be inserted=", end="")
+    arr = capture_inputs()
+    tree = BPlusTree(fanout)
+    for a in arr:
+        tree.insert(a)
+
+    print("Inorder traversal ")
+    tree.inorder_traversal()
+
+    print("\nEnter value to be searched: ")
+    val = int(input())
+    print("Value found: ", tree.search(val))
+    print("Successor: ", tree.successor(val))
+    print("Predecessor: ", tree.predecessor(val))
+
+    if tree.search(val) is not None:
+        tree.delete(val)
+    print("\nInorder traversal after deleting node with value ", val)
+    tree.inorder_traversal()
+
+    print("\nEnter number of keys to benchmark with=", end="")
+    n = int(input())
+    benchmark(n, fanout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Asyncio server for runway reservations
+
+Serves the reservation tree of 5_runway_reservation.py over TCP (or
+a Unix socket) with a line protocol, one request per line:
+
+    RESERVE <t>  ->  OK <t>        | REJECT <earliest available time>
+    LAND         ->  LANDED <t>    | EMPTY
+    LIST         ->  LIST <t1> <t2> ...
+    NEXT <t>     ->  NEXT <earliest available time>
+    anything else -> ERROR <reason>
+
+Requests are not applied as they are read. Every connection handler
+queues its request with a future and the first request of an event
+loop tick schedules a flush for the end of the tick. The flush
+applies all queued requests against the tree in one go, in arrival
+order, and resolves their futures. So under load many concurrent
+requests share one pass over the tree instead of interleaving with
+socket reads and writes.
+
+The load generator opens a number of concurrent connections, fires
+requests on each and reports throughput and p50/p99 latency.
+"""
+import asyncio
+import importlib
+import random
+import time
+
+runway_reservation = importlib.import_module("5_runway_reservation")
+
+
+class ReservationServer:
+
+    def __init__(self, k):
+        if k <= 0:
+            raise Exception("Spacing k must be positive!")
+        self.k = k
+        self.tree = runway_reservation.Tree(None)
+        # (command, argument, future) queued in the current tick
+        self.pending = []
+        self.flush_scheduled = False
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, command, argument):
+        """
+        Queues a request and returns a future for its reply
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((command, argument, future))
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        """
+        Applies every queued request as one batch. A request which
+        fails gets an ERROR reply of its own, the rest of the batch
+        is still answered
+        """
+        batch = self.pending
+        self.pending = []
+        self.flush_scheduled = False
+        self.batches = self.batches + 1
+        self.requests = self.requests + len(batch)
+        for command, argument, future in batch:
+            if future.cancelled():
+                continue
+            try:
+                reply = self.apply(command, argument)
+            except Exception as e:
+                reply = "ERROR " + str(e)
+            future.set_result(reply)
+
+    def apply(self, command, argument):
+        tree = self.tree
+        if command == "RESERVE":
+            status, _ = tree.insert(argument, self.k)
+            if status:
+                return "OK " + str(argument)
+            return "REJECT " + str(tree.next_available(argument, self.k))
+        elif command == "LAND":
+            node = tree.find_min()
+            if node is None:
+                return "EMPTY"
+            t = node.key
+            tree.delete(node)
+            return "LANDED " + str(t)
+        elif command == "LIST":
+            times = []
+            node = tree.find_min()
+            while node is not None:
+                times.append(str(node.key))
+                node = tree.successor(node)
+            return " ".join(["LIST"] + times)
+        elif command == "NEXT":
+            return "NEXT " + str(tree.next_available(argument, self.k))
+        return "ERROR unknown command"
+
+    @staticmethod
+    def parse(line):
+        """
+        Returns (command, argument) or raises ValueError
+        """
+        parts = line.split()
+        if not parts:
+            raise ValueError("empty request")
+        command = parts[0].upper()
+        if command in ("RESERVE", "NEXT"):
+            if len(parts) != 2:
+                raise ValueError(command + " needs a time")
+            return command, int(parts[1])
+        if command in ("LAND", "LIST") and len(parts) == 1:
+            return command, None
+        raise ValueError("unknown command")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    command, argument = ReservationServer.parse(
+                        line.decode())
+                except ValueError as e:
+                    reply = "ERROR " + str(e)
+                else:
+                    reply = await self.submit(command, argument)
+                writer.write(reply.encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8888, path=None):
+        """
+        Starts listening on host:port, or on a Unix socket at path
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path=path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def _client(host, port, path, requests, k, latencies):
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    for _ in range(requests):
+        roll = random.random()
+        if roll < 0.6:
+            line = "RESERVE %d\n" % random.randrange(100 * k * requests)
+        elif roll < 0.8:
+            line = "NEXT %d\n" % random.randrange(100 * k * requests)
+        else:
+            line = "LAND\n"
+        start = time.perf_counter()
+        writer.write(line.encode())
+        await writer.drain()
+        await reader.readline()
+        latencies.append(time.perf_counter() - start)
+
+    writer.close()
+
+
+async def load_generator(host="127.0.0.1", port=8888, path=None,
+                         connections=50, requests=200, k=3):
+    """
+    Runs connections concurrent clients, each sending requests
+    requests one after the other, and reports throughput and
+    p50/p99 latency
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, path, requests, k, latencies)
+                           for _ in range(connections)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = len(latencies)
+    print("Requests=%d connections=%d  %.0f req/s  p50=%.2f ms  p99=%.2f ms"
+          % (total, connections, total / elapsed,
+             latencies[total // 2] * 1e3,
+             latencies[min(total - 1, (total * 99) // 100)] * 1e3))
+
+
+async def run_local(k, connections, requests):
+    """
+    Starts a server on a free local port and runs the load generator
+    against it in the same event loop
+    """
+    reservation_server = ReservationServer(k)
+    server = await reservation_server.start(port=0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        await load_generator(port=port, connections=connections,
+                             requests=requests, k=k)
+    print("Batches=%d, %.1f requests per batch"
+          % (reservation_server.batches,
+             reservation_server.requests / max(1, reservation_server.batches)))
+
+
+async def serve_forever(k, port):
+    server = await ReservationServer(k).start(port=port)
+    async with server:
+        await server.serve_forever()
+
+
+def show_menu():
+    print("\nPress 1 to start the reservation server")
+    print("Press 2 to run the load generator against a running server")
+    print("Press 3 to run server and load generator locally")
+
+
+def main():
+    print("\nEnter the minimum spacing to ensure between landings=", end="")
+    k = int(input())
+    if k <= 0:
+        print("=>Spacing must be positive!")
+        return
+    show_menu()
+    print("\nPlease enter your choice here=", end="")
+    choice = int(input())
+
+    if choice == 1:
+        print("Enter the port to listen on=", end="")
+        port = int(input())
+        asyncio.run(serve_forever(k, port))
+    elif choice == 2:
+        print("Enter the port of the server=", end="")
+        port = int(input())
+        print("Enter number of connections and requests each=", end="")
+        connections, requests = [int(r) for r in input().split()]
+        asyncio.run(load_generator(port=port, connections=connections,
+                                   requests=requests, k=k))
+    elif choice == 3:
+        print("Enter number of connections and requests each=", end="")
+        connections, requests = [int(r) for r in input().split()]
+        asyncio.run(run_local(k, connections, requests))
+    else:
+        print("=>Wrong choice!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Durable runway reservations: write-ahead log plus snapshots
+
+The reservation tree of 5_runway_reservation.py only lives in
+memory. Here every reserve and land is first appended to a log in
+a directory, and the tree can be rebuilt from it after a crash:
+
+- WAL records are 13 bytes: op, time (int64) and a crc32 of both,
+    so a record torn by a crash is detected and cut off on recovery
+- fsync policies trade durability for throughput:
+    always    every operation is fsynced before it returns
+    group     every operation is durable when it returns, but
+              concurrent callers share fsyncs: whoever finds no
+              fsync in flight writes out everything logged so far
+              and syncs it once for all of them (group commit)
+    interval  records are handed to the OS as they are logged, so
+              they survive the process dying. A background thread
+              fsyncs them every fsync_interval seconds, so a machine
+              crash may lose that much
+    none      records are handed to the OS as they are logged and
+              never fsynced: they survive the process dying but not
+              a machine crash
+- Every snapshot_every operations the sorted times are written to a
+    new snapshot file (via rename, so it appears atomically) and a
+    fresh, empty WAL is started. Recovery bulk loads the last
+    snapshot in O(n) and replays at most snapshot_every records
+"""
+import importlib
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+
+runway_reservation = importlib.import_module("5_runway_reservation")
+
+OP_RESERVE = 1
+OP_LAND = 2
+# op, time, crc32 of op and time
+RECORD = struct.Struct("<BqI")
+RECORD_BODY = struct.Struct("<Bq")
+
+SNAPSHOT_MAGIC = b"RWSN"
+# magic, spacing k, count of times
+SNAPSHOT_HEADER = struct.Struct("<4sqQ")
+
+FSYNC_POLICIES = ("always", "group", "interval", "none")
+
+
+def _record(op, t):
+    body = RECORD_BODY.pack(op, t)
+    return RECORD.pack(op, t, zlib.crc32(body))
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+class DurableReservations:
+
+    def __init__(self, directory, k, fsync_policy="group",
+                 fsync_interval=0.01, snapshot_every=100000):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise Exception("Unknown fsync policy " + str(fsync_policy))
+        self.directory = directory
+        self.k = k
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._syncing = False
+        self._pending = bytearray()
+        # operations logged and operations known to be durable
+        self.lsn = 0
+        self.durable_lsn = 0
+        self.since_snapshot = 0
+        self.fsyncs = 0
+        self.snapshots = 0
+        self._closed = False
+
+        os.makedirs(directory, exist_ok=True)
+        self.generation, self.tree, self.replayed = self._recover()
+        self._fd = os.open(self._wal_path(self.generation),
+                           os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+        self._syncer = None
+        if fsync_policy == "interval":
+            self._syncer = threading.Thread(target=self._sync_loop,
+                                            daemon=True)
+            self._syncer.start()
+
+    def _wal_path(self, generation):
+        return os.path.join(self.directory, "wal-%08d.log" % generation)
+
+    def _snapshot_path(self, generation):
+        return os.path.join(self.directory, "snapshot-%08d.bin" % generation)
+
+    def _sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _recover(self):
+        """
+        Loads the newest snapshot and replays its WAL. A torn or
+        corrupt record ends the log, which is truncated there.
+        Files of older generations are removed
+        """
+        generations = list()
+        for name in os.listdir(self.directory):
+            if name.startswith("snapshot-") and name.endswith(".bin"):
+                generations.append(int(name[9:-4]))
+        generation = max(generations) if generations else 0
+
+        if generation > 0:
+            tree = self._load_snapshot(self._snapshot_path(generation))
+        else:
+            tree = runway_reservation.Tree(None)
+
+        replayed = 0
+        path = self._wal_path(generation)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            good = 0
+            while good + RECORD.size <= len(data):
+                op, t, crc = RECORD.unpack_from(data, good)
+                if zlib.crc32(data[good:good + RECORD_BODY.size]) != crc:
+                    break
+                if op == OP_RESERVE:
+                    tree.insert(t, self.k)
+                elif op == OP_LAND:
+                    tree.delete(tree.search(t))
+                else:
+                    break
+                good = good + RECORD.size
+                replayed = replayed + 1
+            if good < len(data):
+                os.truncate(path, good)
+
+        for name in os.listdir(self.directory):
+            keep = ("snapshot-%08d.bin" % generation,
+                    "wal-%08d.log" % generation)
+            if name.startswith(("snapshot-", "wal-")) and name not in keep:
+                os.remove(os.path.join(self.directory, name))
+        return generation, tree, replayed
+
+    def _load_snapshot(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, k, n = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise Exception("Not a reservation snapshot: " + path)
+        if k != self.k:
+            raise Exception("Snapshot was taken with spacing " + str(k))
+        times = array("q")
+        times.frombytes(data[SNAPSHOT_HEADER.size:
+                             SNAPSHOT_HEADER.size + 8 * n])
+        return runway_reservation.build_tree(times, self.k)
+
+    def _write_pending(self, sync):
+        """
+        Writes out the logged records, lock held
+        """
+        if self._pending:
+            _write_all(self._fd, self._pending)
+            self._pending = bytearray()
+        if sync:
+            os.fsync(self._fd)
+            self.fsyncs = self.fsyncs + 1
+            self.durable_lsn = self.lsn
+
+    def _append(self, op, t):
+        """
+        Logs an operation already applied to the tree, lock held.
+        Returns its log sequence number
+        """
+        self._pending += _record(op, t)
+        self.lsn = self.lsn + 1
+        self.since_snapshot = self.since_snapshot + 1
+
+        if self.since_snapshot >= self.snapshot_every:
+            self._snapshot_locked()
+        elif self.fsync_policy == "always":
+            self._write_pending(True)
+        elif self.fsync_policy != "group":
+            # the fsync is left to the background thread (interval)
+            # or the OS (none), but the record must not stay in
+            # this process
+            self._write_pending(False)
+        return self.lsn
+
+    def _sync_loop(self):
+        """
+        Interval policy: fsyncs whatever was written since the last
+        fsync, every fsync_interval seconds, also when traffic has
+        stopped. The fsync runs without the lock so that writers are
+        not held up by it
+        """
+        with self._lock:
+            while True:
+                self._synced.wait(self.fsync_interval)
+                if self._closed:
+                    return
+                if self._syncing or self.durable_lsn == self.lsn:
+                    continue
+
+                upto = self.lsn
+                fd = self._fd
+                self._syncing = True
+                self._lock.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._lock.acquire()
+                    self._syncing = False
+                self.fsyncs = self.fsyncs + 1
+                self.durable_lsn = max(self.durable_lsn, upto)
+                self._synced.notify_all()
+
+    def _group_commit(self, lsn):
+        """
+        Returns once lsn is durable. If no fsync is in flight this
+        thread becomes the leader: it takes everything logged so far,
+        writes and fsyncs it without holding the lock (so others can
+        keep logging meanwhile) and wakes up every waiter it covered
+        """
+        with self._lock:
+            while self.durable_lsn < lsn:
+                if self._syncing:
+                    self._synced.wait()
+                    continue
+
+                data = self._pending
+                upto = self.lsn
+                self._pending = bytearray()
+                self._syncing = True
+                self._lock.release()
+                try:
+                    _write_all(self._fd, data)
+                    os.fsync(self._fd)
+                finally:
+                    self._lock.acquire()
+                    self._syncing = False
+                self.fsyncs = self.fsyncs + 1
+                self.durable_lsn = max(self.durable_lsn, upto)
+                self._synced.notify_all()
+
+    def _commit(self, lsn):
+        if self.fsync_policy == "group":
+            self._group_commit(lsn)
+
+    def reserve(self, t):
+        """
+        Reserves t with spacing k. Returns (status, msg) like
+        Tree.insert
+        """
+        with self._lock:
+            status, msg = self.tree.insert(t, self.k)
+            if not status:
+                return status, msg
+            lsn = self._append(OP_RESERVE, t)
+        self._commit(lsn)
+        return True, None
+
+    def land(self):
+        """
+        Lands the earliest reservation and returns its time, None
+        if there is none
+        """
+        with self._lock:
+            node = self.tree.find_min()
+            if node is None:
+                return None
+            t = node.key
+            self.tree.delete(node)
+            lsn = self._append(OP_LAND, t)
+        self._commit(lsn)
+        return t
+
+    def times(self):
+        with self._lock:
+            return list(self.tree.times())
+
+    def _snapshot_locked(self):
+        """
+        Writes the whole tree to the snapshot of the next generation
+        and switches to an empty WAL. The snapshot covers every
+        logged operation, so records still pending are dropped
+        """
+        while self._syncing:
+            self._synced.wait()
+
+        generation = self.generation + 1
+        path = self._snapshot_path(generation)
+        times = array("q", self.tree.times())
+        with open(path + ".tmp", "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.k, len(times)))
+            f.write(times.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._sync_directory()
+
+        os.close(self._fd)
+        self._fd = os.open(self._wal_path(generation),
+                           os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.remove(self._wal_path(self.generation))
+        if self.generation > 0:
+            os.remove(self._snapshot_path(self.generation))
+
+        self.generation = generation
+        self._pending = bytearray()
+        self.durable_lsn = self.lsn
+        self.since_snapshot = 0
+        self.snapshots = self.snapshots + 1
+        self._synced.notify_all()
+
+    def snapshot(self):
+        with self._lock:
+            self._snapshot_locked()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._synced.notify_all()
+        if self._syncer is not None:
+            self._syncer.join()
+
+        with self._lock:
+            while self._syncing:
+                self._synced.wait()
+            self._write_pending(True)
+            os.close(self._fd)
+
+
+def benchmark(n, k=3, threads=8, snapshot_every=100000):
+    """
+    Reserves n distinct times from the given number of threads under
+    every fsync policy and reports throughput and fsync count, then
+    times recovery for a few snapshot frequencies
+    """
+    per_thread = n // threads
+
+    def worker(reservations, i):
+        for j in range(per_thread):
+            reservations.reserve((j * threads + i) * k)
+
+    for policy in FSYNC_POLICIES:
+        directory = tempfile.mkdtemp()
+        reservations = DurableReservations(directory, k, policy,
+                                           snapshot_every=snapshot_every)
+        workers = [threading.Thread(target=worker, args=(reservations, i))
+                   for i in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        reservations.close()
+        print("fsync=%-8s %9.0f reserves/s  fsyncs=%d"
+              % (policy, per_thread * threads / elapsed, reservations.fsyncs))
+        shutil.rmtree(directory)
+
+    for every in (n // 100, n // 10, n):
+        directory = tempfile.mkdtemp()
+        reservations = DurableReservations(directory, k, "none",
+                                           snapshot_every=max(1, every))
+        # one short of a multiple of every, the longest WAL tail
+        for i in range(n - 1):
+            reservations.reserve(i * k)
+        reservations.close()
+
+        start = time.perf_counter()
+        recovered = DurableReservations(directory, k, "none",
+                                         snapshot_every=max(1, every))
+        elapsed = time.perf_counter() - start
+        print("snapshot every %8d: recovery %.3fs, replayed %d records"
+              % (every, elapsed, recovered.replayed))
+        recovered.close()
+        shutil.rmtree(directory)
+
+
+def show_menu():
+    print("\nPress 1 to make reservation")
+    print("Press 2 to land")
+    print("Press 3 to show current reservations")
+    print("Press 4 to take a snapshot")
+    print("Press 5 to exit the system")
+    print("Press 6 to benchmark fsync policies")
+
+
+def main():
+    print("\nEnter the directory to keep reservations in=", end="")
+    directory = input()
+    print("Enter the minimum spacing to ensure between landings=", end="")
+    k = int(input())
+    print("Enter the fsync policy (always, group, interval, none)=", end="")
+    policy = input().strip()
+
+    reservations = DurableReservations(directory, k, policy)
+    print("Recovered", len(reservations.times()), "reservations,",
+          "replayed", reservations.replayed, "log records")
+
+    exit_system = False
+    while not exit_system:
+        show_menu()
+        print("\nPlease enter your choice here=", end="")
+        choice = int(input())
+        if choice == 1:
+            print("Enter the time at which runway reservation is needed=",
+                  end="")
+            status, msg = reservations.reserve(int(input()))
+            if not status:
+                print(msg)
+        elif choice == 2:
+            if reservations.land() is None:
+                print("=>No plane in queue to land")
+        elif choice == 3:
+            print(*reservations.times())
+        elif choice == 4:
+            reservations.snapshot()
+        elif choice == 5:
+            exit_system = True
+        elif choice == 6:
+            benchmark(20000, k)
+        else:
+            print("=>Wrong choice!")
+    reservations.close()
+
+
+if __name__ == "__main__":
+    main()
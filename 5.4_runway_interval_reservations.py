@@ -0,0 +1,311 @@
+"""
+Variable duration reservations on an interval tree
+
+5_runway_reservation.py books points with one global spacing k.
+Gates and maintenance windows are booked for their own durations,
+so here every booking is a half-open interval [start, end):
+
+- Bookings are kept on an AVL tree keyed by start. Every node also
+    keeps max_end, the largest end in its subtree
+- reserve(start, end) looks for an overlapping booking by walking
+    down a single path: go left if the left subtree ends after
+    start, right otherwise. O(log n)
+- release(start, end) removes a booking in O(log n)
+- overlapping(a, b) returns all bookings overlapping [a, b) in start
+    order. Subtrees whose max_end is not after a are skipped and so
+    is everything right of a node starting at or after b. Bookings
+    never overlap each other, so this costs O(log n + k)
+
+Back to back bookings ([1, 5) and [5, 9)) do not overlap.
+"""
+import random
+import time
+
+
+class Node:
+
+    def __init__(self, start, end, label, parent):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.parent = parent
+        self.left = None
+        self.right = None
+        self.height = 0
+        # largest end in the subtree
+        self.max_end = end
+
+
+def _height(node):
+    if node is None:
+        return -1
+    return node.height
+
+
+class IntervalTree:
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _update(self, node):
+        node.height = 1 + max(_height(node.left), _height(node.right))
+        node.max_end = node.end
+        if node.left is not None:
+            node.max_end = max(node.max_end, node.left.max_end)
+        if node.right is not None:
+            node.max_end = max(node.max_end, node.right.max_end)
+
+    def _replace_child(self, parent, old, new):
+        if new is not None:
+            new.parent = parent
+        if parent is None:
+            self.root = new
+        elif parent.left == old:
+            parent.left = new
+        else:
+            parent.right = new
+
+    def rotate_left(self, node):
+        new_root = node.right
+        node.right = new_root.left
+        if node.right is not None:
+            node.right.parent = node
+        self._replace_child(node.parent, node, new_root)
+        new_root.left = node
+        node.parent = new_root
+        self._update(node)
+        self._update(new_root)
+        return new_root
+
+    def rotate_right(self, node):
+        new_root = node.left
+        node.left = new_root.right
+        if node.left is not None:
+            node.left.parent = node
+        self._replace_child(node.parent, node, new_root)
+        new_root.right = node
+        node.parent = new_root
+        self._update(node)
+        self._update(new_root)
+        return new_root
+
+    def _rebalance(self, node):
+        while node is not None:
+            self._update(node)
+            bf = _height(node.left) - _height(node.right)
+            if bf > 1:
+                if _height(node.left.left) < _height(node.left.right):
+                    self.rotate_left(node.left)
+                node = self.rotate_right(node)
+            elif bf < -1:
+                if _height(node.right.right) < _height(node.right.left):
+                    self.rotate_right(node.right)
+                node = self.rotate_left(node)
+            node = node.parent
+
+    def find_overlap(self, start, end):
+        """
+        Returns a booking overlapping [start, end), None if there is
+        none. If the left subtree ends after start and holds no
+        overlap, then nothing to the right can overlap either: the
+        booking ending last there starts before every right node
+        """
+        curr = self.root
+        while curr is not None:
+            if curr.start < end and start < curr.end:
+                return curr
+            if curr.left is not None and curr.left.max_end > start:
+                curr = curr.left
+            else:
+                curr = curr.right
+        return None
+
+    def reserve(self, start, end, label=None):
+        """
+        Books [start, end) unless it overlaps an existing booking.
+        Returns (status, msg)
+        """
+        if start >= end:
+            raise Exception("A booking must end after it starts!")
+
+        conflict = self.find_overlap(start, end)
+        if conflict is not None:
+            return False, "=>Overlaps booking [%s, %s)" % (conflict.start,
+                                                          conflict.end)
+
+        prev = None
+        curr = self.root
+        while curr is not None:
+            prev = curr
+            if start < curr.start:
+                curr = curr.left
+            else:
+                curr = curr.right
+
+        node = Node(start, end, label, prev)
+        self.size = self.size + 1
+        if prev is None:
+            self.root = node
+            return True, None
+        elif start < prev.start:
+            prev.left = node
+        else:
+            prev.right = node
+        self._rebalance(prev)
+        return True, None
+
+    def search(self, start):
+        curr = self.root
+        while curr is not None and curr.start != start:
+            if start < curr.start:
+                curr = curr.left
+            else:
+                curr = curr.right
+        return curr
+
+    def find_min(self, subtree):
+        curr = subtree
+        while curr.left is not None:
+            curr = curr.left
+        return curr
+
+    def release(self, start, end):
+        """
+        Cancels the booking [start, end). Returns (status, msg)
+        """
+        node = self.search(start)
+        if node is None or node.end != end:
+            return False, "=>No booking [%s, %s)" % (start, end)
+
+        if node.left is not None and node.right is not None:
+            succ = self.find_min(node.right)
+            node.start, node.end, node.label = succ.start, succ.end, \
+                succ.label
+            node = succ
+
+        child = node.left if node.left is not None else node.right
+        parent = node.parent
+        self._replace_child(parent, node, child)
+        self.size = self.size - 1
+        self._rebalance(parent)
+        return True, None
+
+    def overlapping(self, a, b):
+        """
+        Returns (start, end, label) of all bookings overlapping
+        [a, b) sorted by start
+        """
+        result = []
+        stack = []
+        curr = self.root
+        while stack or curr is not None:
+            while curr is not None and curr.max_end > a:
+                stack.append(curr)
+                curr = curr.left
+            if not stack:
+                break
+            curr = stack.pop()
+            if curr.start >= b:
+                # so does everything after it
+                break
+            if curr.end > a:
+                result.append((curr.start, curr.end, curr.label))
+            curr = curr.right
+        return result
+
+    def bookings(self):
+        return self.overlapping(float("-inf"), float("inf"))
+
+    def height(self):
+        return _height(self.root)
+
+
+def benchmark(n, queries=1000):
+    """
+    Books n bookings of random duration in increasing time order,
+    then times overlap queries and checks them against a scan
+    """
+    tree = IntervalTree()
+    intervals = []
+    t = 0
+    start = time.perf_counter()
+    for _ in range(n):
+        t = t + random.randrange(1, 10)
+        end = t + random.randrange(1, 20)
+        if tree.reserve(t, end)[0]:
+            intervals.append((t, end))
+    reserve_time = time.perf_counter() - start
+
+    windows = []
+    for _ in range(queries):
+        a = random.randrange(t)
+        windows.append((a, a + 100))
+
+    start = time.perf_counter()
+    found = [tree.overlapping(a, b) for a, b in windows]
+    query_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = [[(s, e, None) for s, e in intervals if s < b and a < e]
+               for a, b in windows]
+    scan_time = time.perf_counter() - start
+    if found != scanned:
+        raise Exception("Overlap queries do not match the scan!")
+
+    print("n=%d booked=%d height=%d reserve=%.2f us/op "
+          "query=%.1f us scan=%.1f us"
+          % (n, len(tree), tree.height(), reserve_time * 1e6 / n,
+             query_time * 1e6 / queries, scan_time * 1e6 / queries))
+
+
+def show_menu():
+    print("\nPress 1 to book an interval")
+    print("Press 2 to release a booking")
+    print("Press 3 to find bookings overlapping an interval")
+    print("Press 4 to show all bookings")
+    print("Press 5 to exit the system")
+    print("Press 6 to benchmark")
+
+
+def capture_interval():
+    print("Enter the interval (start end)=", end="")
+    start, end = [int(r) for r in input().split()]
+    return start, end
+
+
+def main():
+    tree = IntervalTree()
+    exit_system = False
+    while not exit_system:
+        show_menu()
+        print("\nPlease enter your choice here=", end="")
+        choice = int(input())
+        if choice == 1:
+            status, msg = tree.reserve(*capture_interval())
+            if not status:
+                print(msg)
+        elif choice == 2:
+            status, msg = tree.release(*capture_interval())
+            if not status:
+                print(msg)
+        elif choice == 3:
+            for start, end, _ in tree.overlapping(*capture_interval()):
+                print("[%s, %s)" % (start, end), end=" ")
+        elif choice == 4:
+            for start, end, _ in tree.bookings():
+                print("[%s, %s)" % (start, end), end=" ")
+        elif choice == 5:
+            exit_system = True
+        elif choice == 6:
+            for n in (10 ** 3, 10 ** 4, 10 ** 5):
+                benchmark(n)
+        else:
+            print("=>Wrong choice!")
+
+
+if __name__ == "__main__":
+    main()
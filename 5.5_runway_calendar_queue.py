@@ -0,0 +1,303 @@
+"""
+Calendar queue event engine for landing simulations
+
+Replaying traffic through make_landing of 5_runway_reservation.py
+costs a find_min and a delete on the tree for every landing. A
+calendar queue (Brown, 1988) orders events by time like a desk
+calendar:
+
+- Time is cut into days of a fixed width. There are nbuckets days
+    in a year and an event at time t goes to bucket
+    (t // width) % nbuckets, kept sorted. Events in the same bucket
+    but in later years wait for the calendar to come round again
+- pop walks forward from the current day and takes the first event
+    of a bucket which falls in the day being looked at. If a whole
+    year passes without one (events are sparse), the earliest head
+    of all buckets is taken directly
+- The number of buckets doubles when there are more than two events
+    per bucket and halves when there are fewer than half. The width
+    is then set to three times the average gap between the next
+    few events, so buckets hold O(1) events and both insert and pop
+    take amortized O(1)
+
+LandingEngine keeps the reservation tree only for the spacing
+checks and takes the next landing from the calendar queue. This does
+not make reservations any cheaper than the tree alone: a landed time
+still has to leave the spacing tree with an O(log n) delete, so the
+queue pop is extra work on top of it. The gain is in the queue
+itself, when events are popped far more often than reserved.
+"""
+import heapq
+import importlib
+import random
+import time
+from bisect import insort
+
+runway_reservation = importlib.import_module("5_runway_reservation")
+
+# events sampled to pick a new bucket width
+WIDTH_SAMPLE = 25
+
+
+class CalendarQueue:
+
+    def __init__(self, nbuckets=2, width=1):
+        self.size = 0
+        # tie breaker so that events are never compared
+        self.seq = 0
+        self._setup(nbuckets, width, 0)
+
+    def __len__(self):
+        return self.size
+
+    def _setup(self, nbuckets, width, start):
+        self.nbuckets = nbuckets
+        self.width = width
+        self.buckets = [[] for _ in range(nbuckets)]
+        self._seek(start)
+
+    def _seek(self, t):
+        """
+        Makes the day holding t the current one. Days are numbered
+        by floor division everywhere, so that bucket and day of an
+        event always agree, whatever rounding a float width brings
+        """
+        self.day = int(t // self.width)
+        self.current = self.day % self.nbuckets
+
+    def insert(self, t, event=None):
+        self.seq = self.seq + 1
+        self._insert((t, self.seq, event))
+        self.size = self.size + 1
+        if self.size > 2 * self.nbuckets:
+            self._resize(2 * self.nbuckets)
+
+    def _insert(self, entry):
+        day = int(entry[0] // self.width)
+        insort(self.buckets[day % self.nbuckets], entry)
+        if day < self.day:
+            # earlier than the current day, go back to it
+            self._seek(entry[0])
+
+    def peek(self):
+        entry = self._find()
+        if entry is None:
+            return None
+        return entry[0], entry[2]
+
+    def _find(self):
+        """
+        Returns the earliest entry and moves the current day to it
+        """
+        if self.size == 0:
+            return None
+
+        buckets = self.buckets
+        width = self.width
+        i = self.current
+        day = self.day
+        for _ in range(self.nbuckets):
+            bucket = buckets[i]
+            if bucket and bucket[0][0] // width <= day:
+                self.current = i
+                self.day = day
+                return bucket[0]
+            i = i + 1
+            if i == self.nbuckets:
+                i = 0
+            day = day + 1
+
+        # a whole year without an event, jump to the earliest one
+        entry = min(bucket[0] for bucket in buckets if bucket)
+        self._seek(entry[0])
+        return entry
+
+    def pop(self):
+        """
+        Removes the earliest event and returns (time, event), None
+        if the queue is empty
+        """
+        entry = self._find()
+        if entry is None:
+            return None
+        self.buckets[self.current].pop(0)
+        self.size = self.size - 1
+        if self.nbuckets > 2 and self.size < self.nbuckets // 2:
+            self._resize(self.nbuckets // 2)
+        return entry[0], entry[2]
+
+    def _resize(self, nbuckets):
+        entries = []
+        for bucket in self.buckets:
+            entries.extend(bucket)
+        start = self.day * self.width
+
+        sample = [e[0] for e in heapq.nsmallest(WIDTH_SAMPLE, entries)]
+        gaps = [sample[i + 1] - sample[i] for i in range(len(sample) - 1)]
+        width = self.width
+        if gaps:
+            average = sum(gaps) / len(gaps)
+            # leave out gaps far above average, like a burst ending
+            close = [g for g in gaps if g <= 2 * average]
+            if close and sum(close) > 0:
+                width = 3 * sum(close) / len(close)
+
+        self._setup(nbuckets, width, start)
+        for entry in entries:
+            self._insert(entry)
+
+
+class LandingEngine:
+    """
+    Reservations with spacing k. The tree answers the spacing checks,
+    the calendar queue hands out landings in time order
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.tree = runway_reservation.Tree(None)
+        self.queue = CalendarQueue()
+
+    def reserve(self, t):
+        status, msg = self.tree.insert(t, self.k)
+        if status:
+            self.queue.insert(t)
+        return status, msg
+
+    def land(self):
+        """
+        Lands the earliest reservation and returns its time, None
+        if there is none. The tree holds the same times as the
+        queue, so the landed time is its minimum
+        """
+        entry = self.queue.pop()
+        if entry is None:
+            return None
+        self.tree.delete(self.tree.find_min())
+        return entry[0]
+
+
+def _trace(n, k, backlog):
+    """
+    Hold model trace: every landing is followed by a request this
+    far after it, which keeps about backlog reservations pending
+    """
+    return [random.randrange(1, 8 * k * backlog) for _ in range(n)]
+
+
+def benchmark(n, k=3, backlog=10000):
+    """
+    Replays n landings, each followed by a new request, through the
+    tree alone (find_min and delete per landing) and through the
+    engine, then times the calendar queue alone against the tree
+    used as a priority queue and against heapq, all three on the
+    same events
+    """
+    initial = [i * 8 * k for i in range(backlog)]
+    offsets = _trace(n, k, backlog)
+
+    tree = runway_reservation.Tree(None)
+    for t in initial:
+        tree.insert(t, k)
+    start = time.perf_counter()
+    for offset in offsets:
+        node = tree.find_min()
+        now = node.key
+        tree.delete(node)
+        if not tree.insert(now + offset, k)[0]:
+            tree.insert(tree.next_available(now + offset, k), k)
+    tree_time = time.perf_counter() - start
+
+    engine = LandingEngine(k)
+    for t in initial:
+        engine.reserve(t)
+    start = time.perf_counter()
+    for offset in offsets:
+        now = engine.land()
+        if not engine.reserve(now + offset)[0]:
+            engine.reserve(engine.tree.next_available(now + offset, k))
+    engine_time = time.perf_counter() - start
+
+    if list(tree.times()) != list(engine.tree.times()):
+        raise Exception("Engine and tree disagree on the reservations!")
+
+    queue = CalendarQueue()
+    for t in initial:
+        queue.insert(t)
+    start = time.perf_counter()
+    for offset in offsets:
+        now = queue.pop()[0]
+        queue.insert(now + offset)
+    queue_time = time.perf_counter() - start
+    # taken before the check below empties the queue
+    nbuckets = queue.nbuckets
+
+    # the tree rejects a time it already holds, so equal times are
+    # told apart by a sequence number packed below the time, giving
+    # it the same multiset of events as the calendar queue
+    scale = n + backlog + 1
+    seq = 0
+    queue_tree = runway_reservation.Tree(None)
+    for t in initial:
+        queue_tree.insert(t * scale + seq, 0)
+        seq = seq + 1
+    start = time.perf_counter()
+    for offset in offsets:
+        node = queue_tree.find_min()
+        now = node.key // scale
+        queue_tree.delete(node)
+        queue_tree.insert((now + offset) * scale + seq, 0)
+        seq = seq + 1
+    queue_tree_time = time.perf_counter() - start
+
+    heap = list(initial)
+    heapq.heapify(heap)
+    start = time.perf_counter()
+    for offset in offsets:
+        now = heapq.heappop(heap)
+        heapq.heappush(heap, now + offset)
+    heap_time = time.perf_counter() - start
+
+    tree_times = [key // scale for key in queue_tree.times()]
+    queue_times = [queue.pop()[0] for _ in range(len(queue))]
+    if tree_times != queue_times or sorted(heap) != queue_times or \
+            len(queue_times) != backlog:
+        raise Exception("Priority queues ended up with different events!")
+
+    print("events=%d backlog=%d" % (n, backlog))
+    print("Reservations, tree only:     %.2f us/event" % (tree_time * 1e6 / n))
+    print("Reservations, engine:        %.2f us/event"
+          % (engine_time * 1e6 / n))
+    print("Priority queue, tree:        %.2f us/event"
+          % (queue_tree_time * 1e6 / n))
+    print("Priority queue, calendar:    %.2f us/event  buckets=%d"
+          % (queue_time * 1e6 / n, nbuckets))
+    print("Priority queue, heapq:       %.2f us/event"
+          % (heap_time * 1e6 / n))
+
+
+def main():
+    print("\nEnter the minimum spacing to ensure between landings=", end="")
+    k = int(input())
+    print("Enter the times at which runway reservations are needed=",
+          end="")
+    engine = LandingEngine(k)
+    for t in [int(r) for r in input().split()]:
+        status, msg = engine.reserve(t)
+        if not status:
+            print(t, msg)
+
+    print("Landing order=", end=" ")
+    t = engine.land()
+    while t is not None:
+        print(t, end=" ")
+        t = engine.land()
+    print()
+
+    print("Enter number of events to benchmark with=", end="")
+    n = int(input())
+    benchmark(n, k)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,15 +8,20 @@ Use BST whenever you want Dynamic Sorting i.e. elements
 come and go but you always want a sorted representation
 of elements to be available
 """
+import time
+
+import tree_snapshot
 
 
 class Node:
 
-    def __init__(self, key, parent, left, right):
+    def __init__(self, key, parent, left, right, value=None):
         self.key = key
         self.parent = parent
         self.left = left
         self.right = right
+        # payload when the tree is used as an ordered map
+        self.value = value
 
     def __str__(self):
         s = "key= " + str(self.key)
@@ -35,16 +40,79 @@ class Tree:
     def __init__(self, root):
         self.root = root
 
-    @staticmethod
-    def _rec_inorder(node):
-        if node is None:
-            return
-        Tree._rec_inorder(node.left)
-        print(node.key, end=" ")
-        Tree._rec_inorder(node.right)
+    def iter_inorder(self, lo=None, hi=None, reverse=False):
+        """
+        Lazily yields the keys in sorted order (descending if reverse)
+        limited to the closed range [lo, hi]; either bound may be None.
+
+        Uses an explicit stack holding at most one root-to-leaf path,
+        so memory is O(h), there is no recursion limit to hit on
+        degenerate trees and the scan stops as soon as the consumer
+        stops pulling keys
+        """
+        stack = []
+        curr = self.root
+        if not reverse:
+            # seed the stack with the path to the first key >= lo
+            while curr is not None:
+                if lo is not None and curr.key < lo:
+                    curr = curr.right
+                else:
+                    stack.append(curr)
+                    curr = curr.left
+
+            while stack:
+                node = stack.pop()
+                if hi is not None and node.key > hi:
+                    return
+                yield node.key
+                curr = node.right
+                while curr is not None:
+                    stack.append(curr)
+                    curr = curr.left
+        else:
+            # seed the stack with the path to the last key <= hi
+            while curr is not None:
+                if hi is not None and curr.key > hi:
+                    curr = curr.left
+                else:
+                    stack.append(curr)
+                    curr = curr.right
+
+            while stack:
+                node = stack.pop()
+                if lo is not None and node.key < lo:
+                    return
+                yield node.key
+                curr = node.left
+                while curr is not None:
+                    stack.append(curr)
+                    curr = curr.right
+
+    def __iter__(self):
+        return self.iter_inorder()
 
     def inorder_traversal(self):
-        Tree._rec_inorder(self.root)
+        for key in self.iter_inorder():
+            print(key, end=" ")
+
+    def height(self):
+        """
+        Height of the tree, -1 for an empty tree. Walks level by
+        level so it works on degenerate trees too
+        """
+        height = -1
+        level = [self.root] if self.root is not None else []
+        while level:
+            height = height + 1
+            next_level = []
+            for node in level:
+                if node.left is not None:
+                    next_level.append(node.left)
+                if node.right is not None:
+                    next_level.append(node.right)
+            level = next_level
+        return height
 
     def search(self, val):
         current = self.root
@@ -140,69 +208,241 @@ class Tree:
         node = self.search(val)
         if node is None:
             raise Exception("Node to be deleted is not found!")
+        self._delete_node(node)
 
-        # if it is leaf node then just kill it!
-        if node.left is None and node.right is None:
-            if node.parent is not None and node.parent.left == node:
-                # if the node was left child of its parent
-                node.parent.left = None
-            elif node.parent is not None and node.parent.right == node:
-                # node is right child of its parent
-                node.parent.right = None
+    def _delete_node(self, node):
+        """
+        Removes the given node from the tree
 
-            # if we just deleted the root node then set the self.root ptr accordingly
-            if node == self.root:
-                self.root = None
-            del node
+        1. Node with two children: copy key and value of the
+            successor (min of right subtree) into the node and
+            remove the successor instead, which has no left child
+        2. Node with at most one child: hang that child (if any)
+            in place of the node
+        """
+        if node.left is not None and node.right is not None:
+            succ = node.right
+            while succ.left is not None:
+                succ = succ.left
+            node.key = succ.key
+            node.value = succ.value
+            node = succ
+
+        child = node.left if node.left is not None else node.right
+        if child is not None:
+            child.parent = node.parent
+
+        if node.parent is None:
+            # deleting the root
+            self.root = child
+        elif node.parent.left == node:
+            node.parent.left = child
+        else:
+            node.parent.right = child
+        del node
 
+    def get(self, key, default=None):
+        """
+        Returns value stored against key, default if key is absent
+        """
+        node = self.search(key)
+        if node is None:
+            return default
+        return node.value
+
+    def put(self, key, value):
+        """
+        Stores value against key. Overwrites the value if key is
+        already present else hangs a new leaf, in a single descent
+        """
+        prev = None
+        curr = self.root
+        while curr is not None:
+            if key == curr.key:
+                curr.value = value
+                return
+            prev = curr
+            if key < curr.key:
+                curr = curr.left
+            else:
+                curr = curr.right
+
+        new_node = Node(key, prev, None, None, value)
+        if prev is None:
+            self.root = new_node
+        elif key < prev.key:
+            prev.left = new_node
         else:
-            # intermediate node, just replace with successor's key
-            succ = self.successor(val)
-            node.key = succ.key
-            if succ.parent.left == succ:
-                succ.parent.left = succ.right
-                if succ.right is not None:
-                    succ.right.parent = succ.parent
-                del succ
-            elif succ.parent.right == succ:
-                succ.parent.right = succ.right
-                if succ.right is not None:
-                    succ.right.parent = succ.parent
-                del succ
+            prev.right = new_node
 
+    def pop(self, key, default=None):
+        """
+        Removes key and returns its value, default if key is absent
+        """
+        node = self.search(key)
+        if node is None:
+            return default
+        value = node.value
+        self._delete_node(node)
+        return value
 
-def build_bst(arr):
-    if len(arr) < 1:
-        return None
+    def floor(self, key):
+        """
+        Returns the node with the largest key <= key, None if all
+        keys are larger. key need not be present in the tree.
 
-    root = Node(arr[0], None, None, None)
-    for i in range(1, len(arr)):
-        current = root
-        prev = None
+        Single root to leaf pass: every time we step right the
+        current node is a candidate, every time we step left it
+        is too large
+        """
+        found = None
+        curr = self.root
+        while curr is not None:
+            if curr.key == key:
+                return curr
+            elif curr.key < key:
+                found = curr
+                curr = curr.right
+            else:
+                curr = curr.left
+        return found
 
-        while current is not None:
-            is_left_child_of_parent = False
-            is_right_child_of_parent = False
+    def ceiling(self, key):
+        """
+        Returns the node with the smallest key >= key, None if all
+        keys are smaller
+        """
+        found = None
+        curr = self.root
+        while curr is not None:
+            if curr.key == key:
+                return curr
+            elif curr.key > key:
+                found = curr
+                curr = curr.left
+            else:
+                curr = curr.right
+        return found
+
+    def lower(self, key):
+        """
+        Returns the node with the largest key < key, None if there
+        is no such key
+        """
+        found = None
+        curr = self.root
+        while curr is not None:
+            if curr.key < key:
+                found = curr
+                curr = curr.right
+            else:
+                curr = curr.left
+        return found
+
+    def higher(self, key):
+        """
+        Returns the node with the smallest key > key, None if there
+        is no such key
+        """
+        found = None
+        curr = self.root
+        while curr is not None:
+            if curr.key > key:
+                found = curr
+                curr = curr.left
+            else:
+                curr = curr.right
+        return found
 
-            if arr[i] < current.key:
-                # go left
-                prev = current
-                current = current.left
-                is_left_child_of_parent = True
-            elif arr[i] > current.key:
-                # go right
-                prev = current
-                current = current.right
-                is_right_child_of_parent = True
 
-        newNode = Node(arr[i], prev, None, None)
+def _build_balanced(keys, lo, hi, parent):
+    """
+    Builds a perfectly balanced subtree out of sorted keys[lo:hi]
+    with the middle key as the root
+    """
+    if lo >= hi:
+        return None
+
+    mid = (lo + hi) // 2
+    node = Node(keys[mid], parent, None, None)
+    node.left = _build_balanced(keys, lo, mid, node)
+    node.right = _build_balanced(keys, mid + 1, hi, node)
+    return node
 
-        if is_left_child_of_parent:
-            prev.left = newNode
-        if is_right_child_of_parent:
-            prev.right = newNode
 
-    return Tree(root)
+def build_bst(arr):
+    """
+    Builds a perfectly balanced BST out of arr.
+
+    Inserting the elements one by one builds a linked list shaped
+    tree out of sorted input, costing O(n^2) to build and O(n) per
+    search. Instead the keys are sorted (skipped when arr is already
+    sorted, which is checked in O(n)), duplicates are dropped and
+    the middle key is made the root recursively, which is O(n)
+    after the sort and gives height floor(log2 n)
+    """
+    if len(arr) < 1:
+        return None
+
+    is_sorted = True
+    for i in range(1, len(arr)):
+        if arr[i - 1] > arr[i]:
+            is_sorted = False
+            break
+    keys = arr if is_sorted else sorted(arr)
+
+    # drop duplicates, they are adjacent now
+    distinct = [keys[0]]
+    for i in range(1, len(keys)):
+        if keys[i] != distinct[-1]:
+            distinct.append(keys[i])
+
+    return Tree(_build_balanced(distinct, 0, len(distinct), None))
+
+
+def report_build(n):
+    """
+    Reports build time and resulting height of build_bst for
+    inputs which degenerate one-at-a-time insertion
+    """
+    inputs = [
+        ("sorted", list(range(n))),
+        ("reverse sorted", list(range(n, 0, -1))),
+        ("nearly sorted", [i + (i % 10 == 0) * 5 for i in range(n)]),
+        ("organ pipe", list(range(0, n, 2)) + list(range(n - 1, 0, -2))),
+        ("many duplicates", [i // 10 for i in range(n)]),
+    ]
+    for name, arr in inputs:
+        start = time.perf_counter()
+        tree = build_bst(arr)
+        elapsed = time.perf_counter() - start
+        print("%-16s n=%d build=%.3fs height=%d"
+              % (name, n, elapsed, tree.height()))
+
+
+SNAPSHOT_MAGIC = b"BSTS"
+
+
+def save_snapshot(tree, path, payloads=None):
+    """
+    Writes the sorted keys of the tree (and optionally a dict of
+    payload bytes per key) to path, see tree_snapshot.py
+    """
+    tree_snapshot.save_snapshot(tree.iter_inorder(), path, SNAPSHOT_MAGIC,
+                                payloads)
+
+
+def load_snapshot(path):
+    """
+    Restores a tree written by save_snapshot, building it balanced
+    straight out of the memory mapped keys in O(n).
+
+    Returns (tree, payloads) where payloads is None if the snapshot
+    was written without them
+    """
+    return tree_snapshot.load_snapshot(
+        path, SNAPSHOT_MAGIC,
+        lambda keys: Tree(_build_balanced(keys, 0, len(keys), None)))
 
 
 def capture_inputs():
@@ -213,6 +453,7 @@ def capture_inputs():
 def main():
     arr = capture_inputs()
     tree = build_bst(arr)
+    print("Height of the tree=", tree.height())
 
     print("Inorder traversal ")
     tree.inorder_traversal()
@@ -236,6 +477,11 @@ def main():
     print("\nInorder traversal after deleting node with value ", val)
     tree.inorder_traversal()
 
+    print("\nEnter number of keys to report build time and height for=",
+          end="")
+    n = int(input())
+    report_build(n)
+
 
 if __name__ == "__main__":
     main()
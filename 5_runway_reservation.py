@@ -8,6 +8,8 @@
 
 Do runway reservations in O(log n) time complexity
 """
+import heapq
+import time
 
 
 class Node:
@@ -17,41 +19,219 @@ class Node:
         self.parent = parent
         self.left = left
         self.right = right
+        self.height = 0
+        # smallest and largest key of the subtree and the largest
+        # gap between two consecutive keys inside the subtree
+        self.min_key = key
+        self.max_key = key
+        self.max_gap = NO_GAP
+
+
+# max_gap of a subtree with a single key
+NO_GAP = float("-inf")
+
+
+def _height(node):
+    if node is None:
+        return -1
+    return node.height
 
 
 class Tree:
+    """
+    Reservation set kept on an AVL tree, so that the height stays
+    O(log n) whatever order the requests arrive in (landing times
+    mostly arrive in increasing order, which degenerates a plain BST)
+    """
 
     def __init__(self, root):
         self.root = root
 
+    def _update(self, node):
+        """
+        Refreshes height and gap augmentation of node from its children
+        """
+        left, right = node.left, node.right
+        node.height = 1 + max(_height(left), _height(right))
+        node.min_key = node.key
+        node.max_key = node.key
+        node.max_gap = NO_GAP
+        if left is not None:
+            node.min_key = left.min_key
+            node.max_gap = max(left.max_gap, node.key - left.max_key)
+        if right is not None:
+            node.max_key = right.max_key
+            node.max_gap = max(node.max_gap, right.max_gap,
+                               right.min_key - node.key)
+
+    def _replace_child(self, parent, old, new):
+        if new is not None:
+            new.parent = parent
+        if parent is None:
+            self.root = new
+        elif parent.left == old:
+            parent.left = new
+        else:
+            parent.right = new
+
+    def rotate_left(self, node):
+        new_root = node.right
+        node.right = new_root.left
+        if node.right is not None:
+            node.right.parent = node
+        self._replace_child(node.parent, node, new_root)
+        new_root.left = node
+        node.parent = new_root
+        self._update(node)
+        self._update(new_root)
+        return new_root
+
+    def rotate_right(self, node):
+        new_root = node.left
+        node.left = new_root.right
+        if node.left is not None:
+            node.left.parent = node
+        self._replace_child(node.parent, node, new_root)
+        new_root.right = node
+        node.parent = new_root
+        self._update(node)
+        self._update(new_root)
+        return new_root
+
+    def _rebalance(self, node):
+        """
+        Walks up from node refreshing heights and rotating wherever
+        the balance factor goes out of [-1, 1]
+        """
+        while node is not None:
+            self._update(node)
+            bf = _height(node.left) - _height(node.right)
+            if bf > 1:
+                if _height(node.left.left) < _height(node.left.right):
+                    self.rotate_left(node.left)
+                node = self.rotate_right(node)
+            elif bf < -1:
+                if _height(node.right.right) < _height(node.right.left):
+                    self.rotate_right(node.right)
+                node = self.rotate_left(node)
+            node = node.parent
+
     def insert(self, t, k):
         """
         Insert node t with k spacing
-        """
-        if self.root is None:
-            self.root = Node(t, None, None, None)
-            return True, None
 
-        curr = self.root
+        The in-order predecessor and successor of t both lie on the
+        search path of t, so checking |t - key| < k against every
+        node on the way down covers the whole k window in a single
+        descent. A time which is already reserved is always rejected
+        """
         prev = None
+        curr = self.root
         while curr is not None:
+            if t == curr.key or abs(t - curr.key) < k:
+                msg = "=>Not able to ensure spacing of " + str(k) + \
+                    ", earliest available time is " + \
+                    str(self.next_available(t, k))
+                return False, msg
+            prev = curr
             if t < curr.key:
-                prev = curr
                 curr = curr.left
-            elif t > curr.key:
-                prev = curr
+            else:
                 curr = curr.right
 
-        if t >= prev.key + k:
-            newNode = Node(t, prev, None, None)
-            prev.right = newNode
+        newNode = Node(t, prev, None, None)
+        if prev is None:
+            self.root = newNode
             return True, None
-        elif t <= prev.key - k:
-            newNode = Node(t, prev, None, None)
+        elif t < prev.key:
             prev.left = newNode
-            return True, None
         else:
-            return False, "=>Not able to ensure spacing of " + str(k)
+            prev.right = newNode
+
+        self._rebalance(prev)
+        return True, None
+
+    def _conflicts(self, t, k):
+        curr = self.root
+        while curr is not None:
+            if t == curr.key or abs(t - curr.key) < k:
+                return True
+            if t < curr.key:
+                curr = curr.left
+            else:
+                curr = curr.right
+        return False
+
+    def _first_gap_in(self, node, need):
+        """
+        node's subtree has a gap >= need between consecutive keys.
+        Returns the key just before the leftmost such gap
+        """
+        while True:
+            left, right = node.left, node.right
+            if left is not None and left.max_gap >= need:
+                node = left
+            elif left is not None and node.key - left.max_key >= need:
+                return left.max_key
+            elif right is not None and right.min_key - node.key >= need:
+                return node.key
+            else:
+                node = right
+
+    def _first_gap(self, lo, need):
+        """
+        Returns the smallest key c >= lo such that the next key is
+        at least need away (or there is no next key). None if no
+        key is >= lo.
+
+        The keys >= lo are, in order: the nodes on the search path
+        of lo which are >= lo, deepest first, each followed by its
+        right subtree. That is O(log n) pieces, and max_gap tells
+        in O(1) whether a subtree piece hides the gap, in which
+        case one more descent finds it
+        """
+        path = []
+        curr = self.root
+        while curr is not None:
+            if curr.key >= lo:
+                path.append(curr)
+                curr = curr.left
+            else:
+                curr = curr.right
+
+        prev = None
+        for node in reversed(path):
+            if prev is not None and node.key - prev >= need:
+                return prev
+            prev = node.key
+            sub = node.right
+            if sub is not None:
+                if sub.min_key - prev >= need:
+                    return prev
+                if sub.max_gap >= need:
+                    return self._first_gap_in(sub, need)
+                prev = sub.max_key
+        return prev
+
+    def next_available(self, t, k):
+        """
+        Returns the earliest time >= t with no landing within k.
+
+        If t itself is free that is the answer. Otherwise the
+        answer is c + k for the first reserved time c >= t - k
+        whose next reservation is at least 2k later (or which is
+        the last one): c + k keeps k away from c and everything
+        before it, and from the next reservation too. O(log n)
+
+        With k <= 0 only a reserved time itself conflicts (as in
+        insert), and times being integers the answer is then the
+        next unreserved time >= t, which is what k = 1 gives
+        """
+        if k <= 0:
+            k = 1
+        if not self._conflicts(t, k):
+            return t
+        return self._first_gap(t - k, 2 * k) + k
 
     def find_min(self, subtree=None):
         """
@@ -76,63 +256,206 @@ class Tree:
         """
         if node.right is not None:
             return self.find_min(node.right)
-        
+
         curr = node
         while curr.parent is not None and \
                 curr.parent.left != curr:
             curr = curr.parent
 
-        if curr.parent is None:
-            return None
-        elif curr.parent.left == curr:
-            return curr.parent
-        else:
-            return curr
-
+        return curr.parent
 
     def delete(self, node):
+        """
+        Deletes the node. A node with two children takes over its
+        successor's key and the successor (which has no left child)
+        is unlinked instead. Heights are fixed on the way up
+        """
         if node is None:
             return False, "=>No plane in queue to land"
-        elif node.left is None \
-                and node.right is None:
-            if node.parent is not None \
-                    and node.parent.left == node:
-                node.parent.left = None
-                del node
-            elif node.parent is not None \
-                    and node.parent.right == node:
-                node.parent.right = None
-                del node
-            else:
-                del node
-                self.root = None
-        else:
-            succ = self.successor(node)
+
+        if node.left is not None and node.right is not None:
+            succ = self.find_min(node.right)
             node.key = succ.key
-            if succ.parent.left == succ:
-                succ.parent.left = succ.left
-                if succ.left is not None:
-                    succ.left.parent = succ.parent
-            elif succ.parent.right == succ:
-                succ.parent.right = succ.right
-                if succ.right is not None:
-                    succ.right.parent = succ.parent
-            del succ
+            node = succ
+
+        child = node.left if node.left is not None else node.right
+        parent = node.parent
+        self._replace_child(parent, node, child)
+        del node
+        self._rebalance(parent)
         return True, None
-    
-    @staticmethod
-    def _rec_inorder_traversal(node):
-        if node is None:
-            return
-        Tree._rec_inorder_traversal(node.left)
-        print(node.key, end=" ")
-        Tree._rec_inorder_traversal(node.right)
+
+    def height(self):
+        return _height(self.root)
+
+    def search(self, t):
+        """
+        Returns the node reserved at time t, None if there is none
+        """
+        curr = self.root
+        while curr is not None and curr.key != t:
+            if t < curr.key:
+                curr = curr.left
+            else:
+                curr = curr.right
+        return curr
+
+    def times(self):
+        """
+        Yields the reserved times in increasing order
+        """
+        stack = []
+        curr = self.root
+        while stack or curr is not None:
+            while curr is not None:
+                stack.append(curr)
+                curr = curr.left
+            curr = stack.pop()
+            yield curr.key
+            curr = curr.right
 
     def inorder_traversal(self, node=None):
-        if node is None:
-            Tree._rec_inorder_traversal(self.root)
-        else:
-            Tree._rec_inorder_traversal(node)
+        """
+        Prints the reservations in order, using an explicit stack
+        """
+        stack = []
+        curr = self.root if node is None else node
+        while stack or curr is not None:
+            while curr is not None:
+                stack.append(curr)
+                curr = curr.left
+            curr = stack.pop()
+            print(curr.key, end=" ")
+            curr = curr.right
+
+
+class RunwayScheduler:
+    """
+    Airport with several runways, each with its own spacing k and
+    its own reservation tree.
+
+    - reserve(t) asks every runway for its earliest feasible time
+        >= t in O(log n) each and books the runway which can take
+        the plane earliest
+    - land() pops the next landing across all runways from a heap
+        of per-runway minimum times. An entry is pushed whenever a
+        runway gets a new minimum (a reservation before all others
+        or a landing) and entries which are no longer the minimum
+        of their runway are dropped lazily when they surface, so
+        landing is O(log n + log R) amortized
+
+    Picking the earliest runway has to look at every runway, so
+    reserve is O(R log n)
+    """
+
+    def __init__(self, spacings):
+        self.spacings = list(spacings)
+        self.runways = [Tree(None) for _ in self.spacings]
+        # (minimum time of a runway, runway) entries, possibly stale
+        self.minima = []
+
+    def _push_min(self, r):
+        node = self.runways[r].find_min()
+        if node is not None:
+            heapq.heappush(self.minima, (node.key, r))
+
+    def earliest(self, t):
+        """
+        Returns (runway, time) with the earliest feasible landing
+        time >= t over all runways, ties going to the lower runway
+        """
+        best = None
+        for r, runway in enumerate(self.runways):
+            slot = runway.next_available(t, self.spacings[r])
+            if best is None or slot < best[1]:
+                best = (r, slot)
+        return best
+
+    def reserve(self, t, accept_later=False):
+        """
+        Books t on the runway which can take it. If no runway can
+        take t itself, the earliest alternative is booked when
+        accept_later is set and only reported otherwise.
+
+        Returns (status, runway, time)
+        """
+        r, slot = self.earliest(t)
+        if slot != t and not accept_later:
+            return False, r, slot
+
+        runway = self.runways[r]
+        runway.insert(slot, self.spacings[r])
+        if runway.find_min().key == slot:
+            self._push_min(r)
+        return True, r, slot
+
+    def land(self):
+        """
+        Lands the earliest reserved plane over all runways.
+        Returns (runway, time), None if nothing is reserved
+        """
+        while self.minima:
+            t, r = self.minima[0]
+            node = self.runways[r].find_min()
+            if node is None or node.key != t:
+                # stale entry, this runway landed t already
+                heapq.heappop(self.minima)
+                continue
+
+            heapq.heappop(self.minima)
+            self.runways[r].delete(node)
+            self._push_min(r)
+            return r, t
+        return None
+
+
+def _build_balanced(tree, times, lo, hi, parent):
+    if lo >= hi:
+        return None
+
+    mid = (lo + hi) // 2
+    node = Node(times[mid], parent, None, None)
+    node.left = _build_balanced(tree, times, lo, mid, node)
+    node.right = _build_balanced(tree, times, mid + 1, hi, node)
+    tree._update(node)
+    return node
+
+
+def build_tree(times, k):
+    """
+    Bulk loads sorted reservation times, which must already be at
+    least k apart, into a balanced tree in O(n)
+    """
+    for i in range(1, len(times)):
+        if times[i] - times[i - 1] < max(k, 1):
+            raise Exception("Times must be sorted and at least "
+                            "k apart to bulk load the tree!")
+
+    tree = Tree(None)
+    tree.root = _build_balanced(tree, times, 0, len(times), None)
+    return tree
+
+
+def benchmark(n, k=3):
+    """
+    Reserves n landings arriving in increasing time order (every
+    one of them k apart, so all are accepted) and then lands them
+    all, reporting time per operation and the tree height
+    """
+    runway = Tree(None)
+    start = time.perf_counter()
+    for i in range(n):
+        runway.insert(i * k, k)
+    reserve_time = time.perf_counter() - start
+    height = runway.height()
+
+    start = time.perf_counter()
+    for _ in range(n):
+        runway.delete(runway.find_min())
+    land_time = time.perf_counter() - start
+
+    print("n=%d height=%d reserve=%.2f us/op land=%.2f us/op"
+          % (n, height, reserve_time * 1e6 / n, land_time * 1e6 / n))
 
 tree = Tree(None)
 
@@ -142,6 +465,7 @@ def show_menu():
     print("Press 2 to land")
     print("Press 3 to show current reservations")
     print("Press 4 to exit the system")
+    print("Press 5 to benchmark sorted arrivals")
 
 
 def capture_choice():
@@ -184,6 +508,9 @@ def main():
             show_reservations()
         elif choice == 4:
             exit_system = True
+        elif choice == 5:
+            for n in (10 ** 3, 10 ** 4, 10 ** 5):
+                benchmark(n, k)
         else:
             print("=>Wrong choice!")
 
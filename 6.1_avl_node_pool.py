@@ -0,0 +1,470 @@
+"""
+AVL tree stored in a node pool instead of Node objects.
+
+Every Node object in 6_avl.py carries a __dict__ along with boxed
+key, parent, left, right, height and size attributes. That is well
+over a hundred bytes per key, so at tens of millions of keys memory
+dominates everything else.
+
+Here the tree lives in parallel array.array columns indexed by an
+integer node id:
+
+    key[i], parent[i], left[i], right[i], height[i], size[i]
+
+NIL (-1) plays the role of None. Ids of deleted nodes are chained
+into a free list (through the right column) and handed out again
+on the next insert, so the columns never have holes for long.
+
+The AVL class exposes the same operations as 6_avl.py, only that
+a "node" is now an integer id. Use key(node) to read its key.
+"""
+import importlib
+import random
+import time
+import tracemalloc
+from array import array
+
+NIL = -1
+
+
+class NodePool:
+
+    def __init__(self):
+        # keys are 64 bit signed ints, links and sizes 32 bit ints
+        # and heights fit in a byte (an AVL tree with 2^31 nodes
+        # is still less than 45 levels deep)
+        self.key = array("q")
+        self.parent = array("i")
+        self.left = array("i")
+        self.right = array("i")
+        self.height = array("b")
+        self.size = array("i")
+        self.free_head = NIL
+        self.live = 0
+
+    def allocate(self, key, parent):
+        """
+        Returns id of a fresh leaf node, reusing a freed slot if any
+        """
+        self.live = self.live + 1
+        if self.free_head != NIL:
+            i = self.free_head
+            self.free_head = self.right[i]
+            self.key[i] = key
+            self.parent[i] = parent
+            self.left[i] = NIL
+            self.right[i] = NIL
+            self.height[i] = 0
+            self.size[i] = 1
+            return i
+
+        self.key.append(key)
+        self.parent.append(parent)
+        self.left.append(NIL)
+        self.right.append(NIL)
+        self.height.append(0)
+        self.size.append(1)
+        return len(self.key) - 1
+
+    def release(self, i):
+        """
+        Pushes node id i on the free list
+        """
+        self.live = self.live - 1
+        self.parent[i] = NIL
+        self.left[i] = NIL
+        self.right[i] = self.free_head
+        self.free_head = i
+
+    def nbytes(self):
+        """
+        Bytes held by the column buffers
+        """
+        columns = [self.key, self.parent, self.left,
+                   self.right, self.height, self.size]
+        return sum(len(c) * c.itemsize for c in columns)
+
+
+class AVL:
+
+    def __init__(self):
+        self.pool = NodePool()
+        self.root = NIL
+
+    def key(self, node):
+        return self.pool.key[node]
+
+    def _height(self, node):
+        if node == NIL:
+            return -1
+        return self.pool.height[node]
+
+    def _size(self, node):
+        if node == NIL:
+            return 0
+        return self.pool.size[node]
+
+    def _update(self, node):
+        """
+        Refreshes height and size of node from its children
+        """
+        pool = self.pool
+        l, r = pool.left[node], pool.right[node]
+        pool.height[node] = 1 + max(self._height(l), self._height(r))
+        pool.size[node] = 1 + self._size(l) + self._size(r)
+
+    def _replace_child(self, parent, old, new):
+        """
+        Makes new take the place of old under parent (or as root)
+        """
+        pool = self.pool
+        if new != NIL:
+            pool.parent[new] = parent
+        if parent == NIL:
+            self.root = new
+        elif pool.left[parent] == old:
+            pool.left[parent] = new
+        else:
+            pool.right[parent] = new
+
+    def rotate_left(self, node):
+        """
+        Rotate left from the given node and return the new
+        root of the subtree
+        """
+        pool = self.pool
+        new_root = pool.right[node]
+        shifting = pool.left[new_root]
+
+        pool.right[node] = shifting
+        if shifting != NIL:
+            pool.parent[shifting] = node
+
+        self._replace_child(pool.parent[node], node, new_root)
+        pool.left[new_root] = node
+        pool.parent[node] = new_root
+
+        self._update(node)
+        self._update(new_root)
+        return new_root
+
+    def rotate_right(self, node):
+        """
+        Rotate right from the given node and return the new
+        root of the subtree
+        """
+        pool = self.pool
+        new_root = pool.left[node]
+        shifting = pool.right[new_root]
+
+        pool.left[node] = shifting
+        if shifting != NIL:
+            pool.parent[shifting] = node
+
+        self._replace_child(pool.parent[node], node, new_root)
+        pool.right[new_root] = node
+        pool.parent[node] = new_root
+
+        self._update(node)
+        self._update(new_root)
+        return new_root
+
+    def balance_factor(self, node):
+        pool = self.pool
+        return self._height(pool.left[node]) - self._height(pool.right[node])
+
+    def _rebalance(self, node):
+        """
+        Walks from node up to the root refreshing height and size
+        and rotating wherever the balance factor goes out of [-1, 1].
+        Only the O(log n) ancestors are touched
+        """
+        pool = self.pool
+        while node != NIL:
+            self._update(node)
+            bf = self.balance_factor(node)
+            if bf > 1:
+                if self.balance_factor(pool.left[node]) < 0:
+                    # LR
+                    self.rotate_left(pool.left[node])
+                node = self.rotate_right(node)
+            elif bf < -1:
+                if self.balance_factor(pool.right[node]) > 0:
+                    # RL
+                    self.rotate_right(pool.right[node])
+                node = self.rotate_left(node)
+            node = pool.parent[node]
+
+    def insert(self, val):
+        """
+        Inserts val and returns its node id. If val is
+        already present the existing node id is returned
+        """
+        pool = self.pool
+        if self.root == NIL:
+            self.root = pool.allocate(val, NIL)
+            return self.root
+
+        curr = self.root
+        while True:
+            curr_key = pool.key[curr]
+            if val == curr_key:
+                return curr
+            elif val < curr_key:
+                if pool.left[curr] == NIL:
+                    new_node = pool.allocate(val, curr)
+                    pool.left[curr] = new_node
+                    break
+                curr = pool.left[curr]
+            else:
+                if pool.right[curr] == NIL:
+                    new_node = pool.allocate(val, curr)
+                    pool.right[curr] = new_node
+                    break
+                curr = pool.right[curr]
+
+        self._rebalance(curr)
+        return new_node
+
+    def search(self, val):
+        """
+        Returns node id holding val, None if not found
+        """
+        pool = self.pool
+        curr = self.root
+        while curr != NIL:
+            curr_key = pool.key[curr]
+            if val == curr_key:
+                return curr
+            elif val > curr_key:
+                curr = pool.right[curr]
+            else:
+                curr = pool.left[curr]
+        return None
+
+    def min(self, node=None):
+        if node is None:
+            node = self.root
+        if node == NIL:
+            return None
+
+        left = self.pool.left
+        while left[node] != NIL:
+            node = left[node]
+        return node
+
+    def max(self, node=None):
+        if node is None:
+            node = self.root
+        if node == NIL:
+            return None
+
+        right = self.pool.right
+        while right[node] != NIL:
+            node = right[node]
+        return node
+
+    def successor(self, node):
+        """
+        Returns the node id with next larger key, None if
+        node holds the max key
+        """
+        if node is None:
+            return None
+
+        pool = self.pool
+        if pool.right[node] != NIL:
+            return self.min(pool.right[node])
+
+        parent = pool.parent[node]
+        while parent != NIL and pool.right[parent] == node:
+            node = parent
+            parent = pool.parent[node]
+        if parent == NIL:
+            return None
+        return parent
+
+    def predecessor(self, node):
+        """
+        Returns the node id with next smaller key, None if
+        node holds the min key
+        """
+        if node is None:
+            return None
+
+        pool = self.pool
+        if pool.left[node] != NIL:
+            return self.max(pool.left[node])
+
+        parent = pool.parent[node]
+        while parent != NIL and pool.left[parent] == node:
+            node = parent
+            parent = pool.parent[node]
+        if parent == NIL:
+            return None
+        return parent
+
+    def delete(self, node):
+        """
+        Deletes the given node id.
+
+        A node with two children swaps its key with the successor
+        and the successor node (which has no left child) is
+        removed instead. The freed id goes on the free list
+        """
+        if node is None:
+            return
+
+        pool = self.pool
+        if pool.left[node] != NIL and pool.right[node] != NIL:
+            succ = self.min(pool.right[node])
+            pool.key[node] = pool.key[succ]
+            node = succ
+
+        child = pool.left[node]
+        if child == NIL:
+            child = pool.right[node]
+
+        parent = pool.parent[node]
+        self._replace_child(parent, node, child)
+        pool.release(node)
+        self._rebalance(parent)
+
+    def rank(self, val):
+        """
+        Number of keys strictly smaller than val, O(log n)
+        """
+        pool = self.pool
+        rank = 0
+        curr = self.root
+        while curr != NIL:
+            if val > pool.key[curr]:
+                rank = rank + self._size(pool.left[curr]) + 1
+                curr = pool.right[curr]
+            else:
+                curr = pool.left[curr]
+        return rank
+
+    def select(self, i):
+        """
+        Node id of the i-th smallest key (0-indexed), O(log n)
+        """
+        if i < 0 or i >= self._size(self.root):
+            return None
+
+        pool = self.pool
+        curr = self.root
+        while True:
+            left_size = self._size(pool.left[curr])
+            if i < left_size:
+                curr = pool.left[curr]
+            elif i > left_size:
+                i = i - left_size - 1
+                curr = pool.right[curr]
+            else:
+                return curr
+
+    def count(self, lo, hi):
+        """
+        Number of keys in the closed range [lo, hi], O(log n)
+        """
+        if lo > hi:
+            return 0
+        count_le_hi = self.rank(hi)
+        if self.search(hi) is not None:
+            count_le_hi = count_le_hi + 1
+        return count_le_hi - self.rank(lo)
+
+    def __len__(self):
+        return self.pool.live
+
+    def inorder_traversal(self):
+        """
+        Prints inorder traversal of the tree. Uses an explicit
+        stack so deep trees do not hit the recursion limit
+        """
+        pool = self.pool
+        print("\nInorder traversal: ", end="")
+        stack = []
+        curr = self.root
+        while stack or curr != NIL:
+            while curr != NIL:
+                stack.append(curr)
+                curr = pool.left[curr]
+            curr = stack.pop()
+            print(pool.key[curr], end=" ")
+            curr = pool.right[curr]
+
+
+def measure(n):
+    """
+    Compares the object based AVL of 6_avl.py against the node pool
+    on n random keys. Reports bytes per key (as seen by tracemalloc)
+    and the time of n random searches, which is where the pointer
+    chasing and cache behaviour of each layout shows up
+    """
+    object_avl = importlib.import_module("6_avl")
+    keys = random.sample(range(n * 10), n)
+    sorted_keys = sorted(keys)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    object_tree = object_avl.build_avl(sorted_keys)
+    object_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    pool_tree = AVL()
+    for k in keys:
+        pool_tree.insert(k)
+    pool_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    probes = random.sample(keys, min(n, 100000))
+
+    start = time.perf_counter()
+    for p in probes:
+        object_tree.search(p)
+    object_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p in probes:
+        pool_tree.search(p)
+    pool_time = time.perf_counter() - start
+
+    print("Keys=", n)
+    print("Object nodes: %.1f bytes/key, %.2f us/search"
+          % (object_bytes / n, object_time * 1e6 / len(probes)))
+    print("Node pool:    %.1f bytes/key (%.1f in columns), %.2f us/search"
+          % (pool_bytes / n, pool_tree.pool.nbytes() / n,
+             pool_time * 1e6 / len(probes)))
+
+
+def capture_inputs():
+    raw = input()
+    return [int(r) for r in raw.split()]
+
+
+def main():
+    arr = capture_inputs()
+
+    tree = AVL()
+    for a in arr:
+        tree.insert(a)
+    tree.inorder_traversal()
+
+    print("\nEnter the value to be searched=", end="")
+    val = int(input())
+    node = tree.search(val)
+    if node is not None:
+        tree.delete(node)
+    tree.inorder_traversal()
+
+    print("\nEnter number of keys to measure memory with=", end="")
+    n = int(input())
+    measure(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Persistent (path copying) AVL tree for lock free readers
+
+Nodes are never modified once built. An insert or delete copies only
+the nodes on the root-to-leaf path it walks (plus the few created by
+rotations) and shares every other subtree with the previous version.
+So every write costs O(log n) new nodes and produces a new root,
+while all older roots stay valid, immutable snapshots.
+
+Readers grab the current Version and read it without any locking:
+nobody will ever mutate the nodes reachable from it. Only writers
+are serialized among themselves. Publishing a new version is a
+single attribute assignment, which is atomic.
+
+Old versions are kept in a history so that they can be read again
+by number, and release() drops them. Nodes which are not shared with
+a newer version are then reclaimed by the garbage collector once the
+last reader holding that version lets go of it.
+
+Nodes have no parent pointers, since a shared subtree has many
+parents (one per version).
+"""
+import random
+import threading
+import time
+
+
+class Node:
+
+    __slots__ = ("key", "left", "right", "height", "size")
+
+    def __init__(self, key, left, right):
+        self.key = key
+        self.left = left
+        self.right = right
+        self.height = 1 + max(_height(left), _height(right))
+        self.size = 1 + _size(left) + _size(right)
+
+
+def _height(node):
+    if node is None:
+        return -1
+    return node.height
+
+
+def _size(node):
+    if node is None:
+        return 0
+    return node.size
+
+
+def _balance(key, left, right):
+    """
+    Returns a new node for key over left and right, rotating (by
+    building new nodes) if their heights differ by more than one
+    """
+    bf = _height(left) - _height(right)
+    if bf > 1:
+        if _height(left.left) < _height(left.right):
+            # LR: rotate left child to the left first
+            lr = left.right
+            left = Node(lr.key, Node(left.key, left.left, lr.left), lr.right)
+        # LL: rotate right
+        return Node(left.key, left.left, Node(key, left.right, right))
+    if bf < -1:
+        if _height(right.right) < _height(right.left):
+            # RL: rotate right child to the right first
+            rl = right.left
+            right = Node(rl.key, rl.left,
+                         Node(right.key, rl.right, right.right))
+        # RR: rotate left
+        return Node(right.key, Node(key, left, right.left), right.right)
+    return Node(key, left, right)
+
+
+def _insert(node, key):
+    """
+    Returns root of a new version with key inserted. Returns the
+    same node if key was already present
+    """
+    if node is None:
+        return Node(key, None, None)
+    if key == node.key:
+        return node
+    if key < node.key:
+        left = _insert(node.left, key)
+        if left is node.left:
+            return node
+        return _balance(node.key, left, node.right)
+    right = _insert(node.right, key)
+    if right is node.right:
+        return node
+    return _balance(node.key, node.left, right)
+
+
+def _delete_min(node):
+    """
+    Returns (new subtree without its min, min key)
+    """
+    if node.left is None:
+        return node.right, node.key
+    left, min_key = _delete_min(node.left)
+    return _balance(node.key, left, node.right), min_key
+
+
+def _delete(node, key):
+    """
+    Returns root of a new version with key removed. Returns the same
+    node if key was not present
+    """
+    if node is None:
+        return None
+    if key < node.key:
+        left = _delete(node.left, key)
+        if left is node.left:
+            return node
+        return _balance(node.key, left, node.right)
+    if key > node.key:
+        right = _delete(node.right, key)
+        if right is node.right:
+            return node
+        return _balance(node.key, node.left, right)
+
+    if node.left is None:
+        return node.right
+    if node.right is None:
+        return node.left
+    right, succ_key = _delete_min(node.right)
+    return _balance(succ_key, node.left, right)
+
+
+class Version:
+    """
+    Immutable snapshot of the tree. Safe to read from any thread
+    """
+
+    def __init__(self, number, root):
+        self.number = number
+        self.root = root
+
+    def __len__(self):
+        return _size(self.root)
+
+    def search(self, key):
+        curr = self.root
+        while curr is not None:
+            if key == curr.key:
+                return curr
+            elif key > curr.key:
+                curr = curr.right
+            else:
+                curr = curr.left
+        return None
+
+    def __contains__(self, key):
+        return self.search(key) is not None
+
+    def rank(self, key):
+        """
+        Number of keys strictly smaller than key
+        """
+        rank = 0
+        curr = self.root
+        while curr is not None:
+            if key > curr.key:
+                rank = rank + _size(curr.left) + 1
+                curr = curr.right
+            else:
+                curr = curr.left
+        return rank
+
+    def iter_inorder(self, lo=None, hi=None):
+        """
+        Yields keys in [lo, hi] in sorted order using an explicit stack
+        """
+        stack = []
+        curr = self.root
+        while curr is not None:
+            if lo is not None and curr.key < lo:
+                curr = curr.right
+            else:
+                stack.append(curr)
+                curr = curr.left
+
+        while stack:
+            node = stack.pop()
+            if hi is not None and node.key > hi:
+                return
+            yield node.key
+            curr = node.right
+            while curr is not None:
+                stack.append(curr)
+                curr = curr.left
+
+    def __iter__(self):
+        return self.iter_inorder()
+
+
+class PersistentAVL:
+
+    def __init__(self):
+        self._write_lock = threading.Lock()
+        self.current = Version(0, None)
+        # version number -> Version, for reads of older versions
+        self.history = {0: self.current}
+
+    def snapshot(self):
+        """
+        Returns the latest version. No locking needed
+        """
+        return self.current
+
+    def version(self, number):
+        """
+        Returns an older version which has not been released yet
+        """
+        return self.history[number]
+
+    def _publish(self, root):
+        version = Version(self.current.number + 1, root)
+        self.history[version.number] = version
+        self.current = version
+        return version
+
+    def insert(self, key):
+        with self._write_lock:
+            root = _insert(self.current.root, key)
+            if root is self.current.root:
+                return self.current
+            return self._publish(root)
+
+    def delete(self, key):
+        with self._write_lock:
+            root = _delete(self.current.root, key)
+            if root is self.current.root:
+                return self.current
+            return self._publish(root)
+
+    def release(self, upto):
+        """
+        Forgets every version older than version number upto. The
+        latest version is never released
+        """
+        with self._write_lock:
+            upto = min(upto, self.current.number)
+            for number in [v for v in self.history if v < upto]:
+                del self.history[number]
+
+
+def benchmark(n, readers=4, seconds=2.0):
+    """
+    Read throughput while a writer keeps inserting, for readers taking
+    a global lock around every read (the only safe way to share the
+    mutable AVL of 6_avl.py) versus readers on lock free snapshots
+    """
+    keys = random.sample(range(n * 10), n)
+
+    for mode in ("global lock", "snapshots"):
+        tree = PersistentAVL()
+        for k in keys:
+            tree.insert(k)
+        tree.release(tree.current.number)
+
+        lock = threading.Lock()
+        stop = threading.Event()
+        reads = [0] * readers
+        writes = [0]
+
+        def reader(idx):
+            count = 0
+            while not stop.is_set():
+                if mode == "global lock":
+                    with lock:
+                        tree.current.search(random.choice(keys))
+                else:
+                    tree.snapshot().search(random.choice(keys))
+                count = count + 1
+            reads[idx] = count
+
+        def writer():
+            while not stop.is_set():
+                key = random.randrange(n * 10)
+                if mode == "global lock":
+                    with lock:
+                        tree.insert(key)
+                else:
+                    tree.insert(key)
+                writes[0] = writes[0] + 1
+                if writes[0] % 1000 == 0:
+                    tree.release(tree.current.number)
+
+        threads = [threading.Thread(target=reader, args=(i,))
+                   for i in range(readers)]
+        threads.append(threading.Thread(target=writer))
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+        print("%-12s reads/s=%d writes/s=%d"
+              % (mode, sum(reads) / seconds, writes[0] / seconds))
+
+
+def capture_inputs():
+    raw = input()
+    return [int(r) for r in raw.split()]
+
+
+def main():
+    arr = capture_inputs()
+
+    tree = PersistentAVL()
+    for a in arr:
+        tree.insert(a)
+    before = tree.snapshot()
+
+    print("Enter the value to be deleted=", end="")
+    val = int(input())
+    tree.delete(val)
+
+    print("Version", before.number, ":", list(before))
+    print("Version", tree.current.number, ":", list(tree.snapshot()))
+
+    print("Enter number of keys to benchmark with=", end="")
+    n = int(input())
+    benchmark(n)
+
+
+if __name__ == "__main__":
+    main()
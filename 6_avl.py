@@ -8,42 +8,51 @@ is the height of the tree. Now with balanced
 BST trees those operations can run in O(log n)
 """
 import math
+import random
+from bisect import bisect_left, bisect_right, insort
+
+import tree_snapshot
 
 
 class Node:
 
-    def __init__(self, key, parent, left, right, height=0):
+    def __init__(self, key, parent, left, right, height=0, size=1):
         self.key = key
         self.parent = parent
         self.left = left
         self.right = right
         self.height = height
+        # number of nodes in the subtree rooted at this node
+        # (inclusive), used for order-statistic queries
+        self.size = size
 
 
 class AVL:
 
-    def __init__(self, root):
+    def __init__(self, root, verbose=True):
         self.root = root
+        # print every insert, delete and rotation as it happens
+        self.verbose = verbose
 
-    def recalculate_height(self, subtree):
+    @staticmethod
+    def size(node):
         """
-        Recalculate height of all nodes under this subtree (inclusive)
-        and updates it. Generally, this would be called with the root 
-        node so that the entire tree's height is updated
-
-        height = 1 + max(left.height, right.height)
+        Returns number of nodes in the subtree rooted at node
         """
-        if subtree is None:
-            return -1
-
-        height_left = self.recalculate_height(subtree.left)
-        height_right = self.recalculate_height(subtree.right)
+        if node is None:
+            return 0
+        return node.size
 
-        height = 1 + max(height_left, height_right)
+    @staticmethod
+    def _update(node):
+        """
+        Refreshes height and size of node from its children
 
-        # update height
-        subtree.height = height
-        return height
+        height = 1 + max(left.height, right.height)
+        size = 1 + left.size + right.size
+        """
+        node.height = 1 + max(AVL._height(node.left), AVL._height(node.right))
+        node.size = 1 + AVL.size(node.left) + AVL.size(node.right)
 
     def balance_factor(self, node):
         """
@@ -61,24 +70,6 @@ class AVL:
 
         return h_left - h_right
 
-    def is_balanced(self, node):
-        """
-        If BF > 1 or BF < -1 that means subtree is unbalanced
-        else keep recursing upwards
-
-        Returns the bf_status and unbalanced_node that is first
-        encountered in the ancestoral path
-        """
-        if node is None:
-            return True, None
-
-        bf = self.balance_factor(node)
-        if bf > 1 or bf < -1:
-            return False, node
-
-        # recurse in the upwards direction of the tree
-        return self.is_balanced(node.parent)
-
     def rotate(self, node):
         """
         Figures out the current orientation of the subtree
@@ -88,29 +79,35 @@ class AVL:
         2. RR => rotate_left
         3. RL => rotate_right(node.right) followed by rotate_left(node)
         4. LR => rotate_left(node.left) followed by rotate_right(node)
+
+        Returns the new root of the subtree
         """
         orn = self.find_orientation(node)
         if orn == "RR":
-            print("=>Rotate-Left ", node.key)
-            self.rotate_left(node)
+            if self.verbose:
+                print("=>Rotate-Left ", node.key)
+            return self.rotate_left(node)
         elif orn == "LL":
-            print("=>Rotate-Right ", node.key)
-            self.rotate_right(node)
+            if self.verbose:
+                print("=>Rotate-Right ", node.key)
+            return self.rotate_right(node)
         elif orn == "RL":
             # case of wedge
             # rotate the "right child" to left to bring linear
             # orientation of RR
-            print("=>Rotate-Right ", node.right.key,
-                  " and then Rotate-Left ", node.key)
+            if self.verbose:
+                print("=>Rotate-Right ", node.right.key,
+                      " and then Rotate-Left ", node.key)
             self.rotate_right(node.right)
             # followed by normal left rotation of node
-            self.rotate_left(node)
+            return self.rotate_left(node)
         else:
             # LR - similar to above wedge case
-            print("=>Rotate-Left ", node.left.key,
-                  " and then Rotate-Right ", node.key)
+            if self.verbose:
+                print("=>Rotate-Left ", node.left.key,
+                      " and then Rotate-Right ", node.key)
             self.rotate_left(node.left)
-            self.rotate_right(node)
+            return self.rotate_right(node)
 
     def find_orientation(self, node):
         """
@@ -129,7 +126,10 @@ class AVL:
             # right subtree is more heavy
             orientation.append("R")
             bf_rchild = self.balance_factor(node.right)
-            if bf_rchild < 0:
+            # a child with balance 0 (possible after a delete)
+            # needs a single rotation, a double one would leave
+            # the subtree unbalanced
+            if bf_rchild <= 0:
                 orientation.append("R")
             else:
                 orientation.append("L")
@@ -155,6 +155,9 @@ class AVL:
         4. Hang the (old root) node as left child of new root
         5. Handle pointer to the new root's parent depending upon
             left child of parent, right child or root of the tree
+        6. Refresh height and size of node and new root
+
+        Returns the new root of the subtree
         """
         # step 1: Backup parent of the node
         parent = node.parent
@@ -196,6 +199,11 @@ class AVL:
             # rotated
             self.root = newRoot
 
+        # step 6: refresh the lower node first, then the new root
+        AVL._update(node)
+        AVL._update(newRoot)
+        return newRoot
+
     def rotate_right(self, node):
         """
         Rotate right from the given node
@@ -207,6 +215,9 @@ class AVL:
         4. Hang the (old root) node as right child of newRoot
         5. Handle pointer to the newRoot's parent depending
             upon left child, right child of parent or root node
+        6. Refresh height and size of node and new root
+
+        Returns the new root of the subtree
         """
 
         # step 1. Backup the node's parent
@@ -241,51 +252,58 @@ class AVL:
             # step 5: If the node is the root node of the tree
             self.root = newRoot
 
+        # step 6: refresh the lower node first, then the new root
+        AVL._update(node)
+        AVL._update(newRoot)
+        return newRoot
+
     def insert(self, val):
         """
-        Insert as in normal BST just that:
-        - Keep incrementing height of every touched node
-        - Rebalance tree from bottom to top seen nodes 
-            of the tree
+        Insert as in normal BST and then rebalance on the way
+        back up from the new node. Inserting a key which is
+        already present does nothing.
+
+        Returns the node holding val
         """
-        print("Inserting", val, "in the AVL tree..")
+        if self.verbose:
+            print("Inserting", val, "in the AVL tree..")
         if self.root is None:
             newNode = Node(val, None, None, None)
             self.root = newNode
-            return
+            return newNode
 
         curr = self.root
-        prev = None
-        while curr is not None:
-            is_left_child = False
-
-            if val > curr.key:
-                prev = curr
-                # curr.height = curr.height + 1
-                curr = curr.right
-                is_left_child = False
+        while True:
+            if val == curr.key:
+                return curr
             elif val < curr.key:
-                prev = curr
-                # curr.height = curr.height + 1
+                if curr.left is None:
+                    newNode = Node(val, curr, None, None)
+                    curr.left = newNode
+                    break
                 curr = curr.left
-                is_left_child = True
-
-        newNode = Node(val, prev, None, None)
-        if is_left_child:
-            prev.left = newNode
-        else:
-            prev.right = newNode
+            else:
+                if curr.right is None:
+                    newNode = Node(val, curr, None, None)
+                    curr.right = newNode
+                    break
+                curr = curr.right
 
-        # recalculate height of the entire tree
-        self.recalculate_height(self.root)
+        self._rebalance(curr)
+        return newNode
 
-        # check if AVL is balanced (upto the root)
-        bal_status, unbalanced_node = self.is_balanced(newNode)
-        if not bal_status:
-            # do one or more rotations
-            self.rotate(unbalanced_node)
-            # recalculate the height
-            self.recalculate_height(self.root)
+    def _rebalance(self, node):
+        """
+        Walks from node up to the root refreshing height and size
+        and rotating wherever the balance factor goes out of [-1, 1].
+        Only the O(log n) ancestors are touched
+        """
+        while node is not None:
+            AVL._update(node)
+            bf = self.balance_factor(node)
+            if bf > 1 or bf < -1:
+                node = self.rotate(node)
+            node = node.parent
 
     def search(self, val):
         """
@@ -381,83 +399,515 @@ class AVL:
         """
         Delete node has 3 cases:
         1. node to be deleted has no children i.e. it is the
-            leaf node. Just kill the node.
-        2. node to be deleted has one child. Overwrite the 
-            contents of the node with its children and also 
-            set the parent and child pointers. And delete 
-            the node
+            leaf node. Just unlink the node.
+        2. node to be deleted has one child. Hang the child
+            in place of the node.
         3. node to be deleted has two children. Overwrite
-            the contents of the node with its successor and
-            call delete(succ)
+            the key of the node with its successor's and
+            remove the successor node instead, which has no
+            left child and so falls in case 1 or 2
+
+        Then rebalance from the parent of the removed node up
         """
 
         if node is None:
             # the node to be deleted does not exist
             return
 
-        print("Deleting", node.key, "from the AVL tree..")
+        if self.verbose:
+            print("Deleting", node.key, "from the AVL tree..")
+        if node.left is not None and \
+                node.right is not None:
+            succ = self.min(node.right)
+            node.key = succ.key
+            node = succ
+
+        child = node.left
+        if child is None:
+            child = node.right
+
         parent = node.parent
-        if node.left is None and \
-                node.right is None:
-            # is a leaf node then just kill it
-            if node == self.root:
-                self.root = None
-            elif node.parent.left == node:
-                node.parent.left = None
+        if child is not None:
+            child.parent = parent
+        if parent is None:
+            self.root = child
+        elif parent.left == node:
+            parent.left = child
+        else:
+            parent.right = child
+
+        self._rebalance(parent)
+
+    def rank(self, val):
+        """
+        Returns the number of keys in the tree which are strictly
+        smaller than val. val need not be present in the tree.
+
+        Walk down from the root like search; every time we go
+        right, the current node and its whole left subtree are
+        smaller than val. Runs in O(log n)
+        """
+        rank = 0
+        curr = self.root
+        while curr is not None:
+            if val > curr.key:
+                rank = rank + AVL.size(curr.left) + 1
+                curr = curr.right
             else:
-                node.parent.right = None
+                curr = curr.left
+        return rank
 
-            del node
-        else:
-            # node to be deleted has one child
-            # just overwrite the contents of node
-            # with the child which is there and
-            # delete the node
-            if node.left is None and \
-                    node.right is not None:
-                node.key = node.right.key
-                node.right.parent = node.parent
-                node.right = node.right.right
-                del node
-            elif node.left is not None and \
-                    node.right is None:
-                node.key = node.left.key
-                node.left.parent = node.parent
-                node.left = node.left.left
-                del node
+    def select(self, i):
+        """
+        Returns the node holding the i-th smallest key (0-indexed),
+        None if i is out of range. Runs in O(log n)
+        """
+        if i < 0 or i >= AVL.size(self.root):
+            return None
+
+        curr = self.root
+        while curr is not None:
+            left_size = AVL.size(curr.left)
+            if i < left_size:
+                curr = curr.left
+            elif i > left_size:
+                i = i - left_size - 1
+                curr = curr.right
             else:
-                # node to be deleted has two children
-                # just overwrite the contents with
-                # the successor and call delete(succ)
-                succ = self.successor(node)
-                node.key = succ.key
-                self.delete(succ)
-        # recalculate the height of the tree starting
-        # from its root
-        self.recalculate_height(self.root)
-        bal_status, unbal_node = self.is_balanced(parent)
-        if not bal_status:
-            self.rotate(unbal_node)
-            self.recalculate_height(self.root)
+                return curr
+        return curr
+
+    def count(self, lo, hi):
+        """
+        Returns the number of keys in the closed range [lo, hi]
+        using two rank queries, hence O(log n)
+        """
+        if lo > hi:
+            return 0
+
+        # keys <= hi are the keys < hi plus hi itself if present
+        count_le_hi = self.rank(hi)
+        if self.search(hi) is not None:
+            count_le_hi = count_le_hi + 1
+
+        return count_le_hi - self.rank(lo)
 
     @staticmethod
-    def _rec_inorder_traversal(node):
+    def _height(node):
+        if node is None:
+            return -1
+        return node.height
+
+    @staticmethod
+    def _link(node, left, right):
+        """
+        Hangs left and right as children of node and refreshes
+        the height and size of node from its children. Returns
+        node so that calls can be chained
+        """
+        node.left = left
+        node.right = right
+        if left is not None:
+            left.parent = node
+        if right is not None:
+            right.parent = node
+        node.height = 1 + max(AVL._height(left), AVL._height(right))
+        node.size = 1 + AVL.size(left) + AVL.size(right)
+        return node
+
+    @staticmethod
+    def _rotate_left_subtree(node):
         """
-        Recursively prints the inorder traversal of the tree
+        Same as rotate_left but works on a detached subtree
+        and returns its new root instead of fixing self.root
+        """
+        new_root = node.right
+        AVL._link(node, node.left, new_root.left)
+        return AVL._link(new_root, node, new_root.right)
+
+    @staticmethod
+    def _rotate_right_subtree(node):
+        new_root = node.left
+        AVL._link(node, new_root.right, node.right)
+        return AVL._link(new_root, new_root.left, node)
+
+    @staticmethod
+    def _join_right(left, node, right):
+        """
+        left is taller than right. Walk down the right spine of
+        left till a subtree of about the same height as right is
+        found, hang node there and rebalance on the way back up
+        """
+        l, c = left.left, left.right
+        if AVL._height(c) <= AVL._height(right) + 1:
+            t = AVL._link(node, c, right)
+            if AVL._height(t) <= AVL._height(l) + 1:
+                return AVL._link(left, l, t)
+            t = AVL._rotate_right_subtree(t)
+            return AVL._rotate_left_subtree(AVL._link(left, l, t))
+
+        t = AVL._join_right(c, node, right)
+        AVL._link(left, l, t)
+        if AVL._height(t) <= AVL._height(l) + 1:
+            return left
+        return AVL._rotate_left_subtree(left)
+
+    @staticmethod
+    def _join_left(left, node, right):
+        """
+        Mirror image of _join_right when right is the taller tree
+        """
+        c, r = right.left, right.right
+        if AVL._height(c) <= AVL._height(left) + 1:
+            t = AVL._link(node, left, c)
+            if AVL._height(t) <= AVL._height(r) + 1:
+                return AVL._link(right, t, r)
+            t = AVL._rotate_left_subtree(t)
+            return AVL._rotate_right_subtree(AVL._link(right, t, r))
+
+        t = AVL._join_left(left, node, c)
+        AVL._link(right, t, r)
+        if AVL._height(t) <= AVL._height(r) + 1:
+            return right
+        return AVL._rotate_right_subtree(right)
+
+    @staticmethod
+    def _join(left, node, right):
+        """
+        Joins subtrees left and right using node as the middle key.
+        All keys of left < node.key < all keys of right.
+        Runs in O(|height(left) - height(right)| + 1)
+        """
+        if AVL._height(left) > AVL._height(right) + 1:
+            return AVL._join_right(left, node, right)
+        if AVL._height(right) > AVL._height(left) + 1:
+            return AVL._join_left(left, node, right)
+        return AVL._link(node, left, right)
+
+    @staticmethod
+    def _split(node, val):
+        """
+        Splits the subtree into (keys < val, node with key == val,
+        keys > val). The middle element is None if val is absent
         """
         if node is None:
-            return
+            return None, None, None
+
+        left, right = node.left, node.right
+        if val == node.key:
+            if left is not None:
+                left.parent = None
+            if right is not None:
+                right.parent = None
+            AVL._link(node, None, None)
+            return left, node, right
+        elif val < node.key:
+            l, found, r = AVL._split(left, val)
+            return l, found, AVL._join(r, node, right)
+        else:
+            l, found, r = AVL._split(right, val)
+            return AVL._join(left, node, l), found, r
 
-        AVL._rec_inorder_traversal(node.left)
-        print(node.key, end=" ")
-        AVL._rec_inorder_traversal(node.right)
+    @staticmethod
+    def _split_last(node):
+        """
+        Removes the max node from the subtree. Returns the remaining
+        subtree and the max node
+        """
+        if node.right is None:
+            left = node.left
+            AVL._link(node, None, None)
+            return left, node
+
+        rest, last = AVL._split_last(node.right)
+        return AVL._join(node.left, node, rest), last
+
+    @staticmethod
+    def _join2(left, right):
+        """
+        Joins two subtrees without a middle key by borrowing
+        the max node of left as the middle key
+        """
+        if left is None:
+            return right
+        rest, last = AVL._split_last(left)
+        return AVL._join(rest, last, right)
+
+    @staticmethod
+    def _union(t1, t2):
+        if t1 is None:
+            return t2
+        if t2 is None:
+            return t1
+
+        left, right = t1.left, t1.right
+        l2, _, r2 = AVL._split(t2, t1.key)
+        return AVL._join(AVL._union(left, l2), t1,
+                         AVL._union(right, r2))
+
+    @staticmethod
+    def _intersection(t1, t2):
+        if t1 is None or t2 is None:
+            return None
+
+        left, right = t1.left, t1.right
+        l2, found, r2 = AVL._split(t2, t1.key)
+        l = AVL._intersection(left, l2)
+        r = AVL._intersection(right, r2)
+        if found is not None:
+            return AVL._join(l, t1, r)
+        return AVL._join2(l, r)
+
+    @staticmethod
+    def _difference(t1, t2):
+        if t1 is None:
+            return None
+        if t2 is None:
+            return t1
+
+        l1, _, r1 = AVL._split(t1, t2.key)
+        return AVL._join2(AVL._difference(l1, t2.left),
+                          AVL._difference(r1, t2.right))
+
+    @staticmethod
+    def _as_tree(root):
+        """
+        Wraps a detached subtree root as an AVL tree
+        """
+        if root is not None:
+            root.parent = None
+        return AVL(root)
+
+    def split(self, val):
+        """
+        Splits this tree around val in O(log n).
+
+        Returns (left, node, right) where left is an AVL tree with
+        all keys < val, right is an AVL tree with all keys > val
+        and node is the node holding val (None if val is absent).
+        The nodes are reused, so this tree is left empty
+        """
+        left, found, right = AVL._split(self.root, val)
+        self.root = None
+        return AVL._as_tree(left), found, AVL._as_tree(right)
+
+    @staticmethod
+    def join(left, right):
+        """
+        Joins two AVL trees where every key of left is smaller
+        than every key of right, in O(log n). Both input trees
+        are left empty
+        """
+        root = AVL._join2(left.root, right.root)
+        left.root = None
+        right.root = None
+        return AVL._as_tree(root)
+
+    def union(self, other):
+        """
+        Returns a new AVL tree with keys present in either tree.
+
+        Split based set operations run in O(m log(n/m + 1)) where
+        m <= n are the sizes of the two trees, instead of the
+        O(m log n) of inserting keys one by one. Nodes are reused,
+        so both input trees are left empty
+        """
+        root = AVL._union(self.root, other.root)
+        self.root = None
+        other.root = None
+        return AVL._as_tree(root)
+
+    def intersection(self, other):
+        """
+        Returns a new AVL tree with keys present in both trees.
+        Both input trees are left empty
+        """
+        root = AVL._intersection(self.root, other.root)
+        self.root = None
+        other.root = None
+        return AVL._as_tree(root)
+
+    def difference(self, other):
+        """
+        Returns a new AVL tree with keys of this tree which are
+        not in other. This tree is left empty, other is untouched
+        """
+        root = AVL._difference(self.root, other.root)
+        self.root = None
+        return AVL._as_tree(root)
+
+    def iter_inorder(self, lo=None, hi=None, reverse=False):
+        """
+        Lazily yields the keys in sorted order (descending if reverse)
+        limited to the closed range [lo, hi]; either bound may be None.
+
+        Uses an explicit stack holding at most one root-to-leaf path,
+        so memory is O(h), there is no recursion limit to hit on
+        degenerate trees and the scan stops as soon as the consumer
+        stops pulling keys
+        """
+        stack = []
+        curr = self.root
+        if not reverse:
+            # seed the stack with the path to the first key >= lo
+            while curr is not None:
+                if lo is not None and curr.key < lo:
+                    curr = curr.right
+                else:
+                    stack.append(curr)
+                    curr = curr.left
+
+            while stack:
+                node = stack.pop()
+                if hi is not None and node.key > hi:
+                    return
+                yield node.key
+                curr = node.right
+                while curr is not None:
+                    stack.append(curr)
+                    curr = curr.left
+        else:
+            # seed the stack with the path to the last key <= hi
+            while curr is not None:
+                if hi is not None and curr.key > hi:
+                    curr = curr.left
+                else:
+                    stack.append(curr)
+                    curr = curr.right
+
+            while stack:
+                node = stack.pop()
+                if lo is not None and node.key < lo:
+                    return
+                yield node.key
+                curr = node.left
+                while curr is not None:
+                    stack.append(curr)
+                    curr = curr.right
+
+    def __iter__(self):
+        return self.iter_inorder()
 
     def inorder_traversal(self):
         """
         Prints inorder traversal of the tree
         """
         print("\nInorder traversal: ", end="")
-        AVL._rec_inorder_traversal(self.root)
+        for key in self.iter_inorder():
+            print(key, end=" ")
+
+
+def _build_balanced(keys, lo, hi, parent):
+    """
+    Builds a perfectly balanced subtree out of keys[lo:hi]
+    with the middle key as the root
+    """
+    if lo >= hi:
+        return None
+
+    mid = (lo + hi) // 2
+    node = Node(keys[mid], parent, None, None)
+    node.left = _build_balanced(keys, lo, mid, node)
+    node.right = _build_balanced(keys, mid + 1, hi, node)
+    node.height = 1 + max(AVL._height(node.left), AVL._height(node.right))
+    node.size = hi - lo
+    return node
+
+
+def build_avl(keys):
+    """
+    Bulk loads a sorted sequence of distinct keys into a perfectly
+    balanced AVL tree in O(n), instead of O(n log n) insertions
+    """
+    for i in range(1, len(keys)):
+        if keys[i - 1] >= keys[i]:
+            raise Exception("Keys must be sorted and distinct "
+                            "to bulk load an AVL tree!")
+
+    return AVL(_build_balanced(keys, 0, len(keys), None))
+
+
+def _check_subtree(node, parent):
+    """
+    Returns (height, size) of the subtree after checking parent
+    pointers, the AVL balance and the stored height and size
+    """
+    if node is None:
+        return -1, 0
+    if node.parent is not parent:
+        raise Exception("Wrong parent pointer at " + str(node.key))
+
+    h_left, s_left = _check_subtree(node.left, node)
+    h_right, s_right = _check_subtree(node.right, node)
+    height = 1 + max(h_left, h_right)
+    size = 1 + s_left + s_right
+    if abs(h_left - h_right) > 1 or node.height != height or \
+            node.size != size:
+        raise Exception("Height, size or balance off at " + str(node.key))
+    return height, size
+
+
+def check(n, key_range=1000):
+    """
+    Runs n random inserts and deletes against a sorted list and
+    checks keys, balance, rank, select and count after each one
+    """
+    tree = AVL(None, verbose=False)
+    keys = []
+    for _ in range(n):
+        val = random.randrange(key_range)
+        if keys and random.random() < 0.4:
+            val = random.choice(keys)
+            tree.delete(tree.search(val))
+            keys.remove(val)
+        else:
+            tree.insert(val)
+            if val not in keys:
+                insort(keys, val)
+
+        if list(tree.iter_inorder()) != keys:
+            raise Exception("AVL keys differ from the sorted list!")
+        _check_subtree(tree.root, None)
+
+        probe = random.randrange(-1, key_range + 1)
+        lo, hi = sorted([probe, random.randrange(key_range)])
+        i = random.randrange(len(keys) + 1)
+        selected = tree.select(i)
+        if tree.rank(probe) != bisect_left(keys, probe) or \
+                tree.count(lo, hi) != \
+                bisect_right(keys, hi) - bisect_left(keys, lo) or \
+                (selected.key if selected is not None else None) != \
+                (keys[i] if i < len(keys) else None):
+            raise Exception("rank, select or count differ from the "
+                            "sorted list!")
+
+    print("Checked %d random operations, %d keys left, height=%d"
+          % (n, len(keys), AVL._height(tree.root)))
+
+
+SNAPSHOT_MAGIC = b"AVLS"
+
+
+def save_snapshot(tree, path, payloads=None):
+    """
+    Writes the sorted keys of the tree (and optionally a dict of
+    payload bytes per key) to path, see tree_snapshot.py
+    """
+    tree_snapshot.save_snapshot(tree.iter_inorder(), path, SNAPSHOT_MAGIC,
+                                payloads)
+
+
+def load_snapshot(path):
+    """
+    Restores a tree written by save_snapshot, building it balanced
+    straight out of the memory mapped keys in O(n).
+
+    Returns (tree, payloads) where payloads is None if the snapshot
+    was written without them
+    """
+    return tree_snapshot.load_snapshot(
+        path, SNAPSHOT_MAGIC,
+        lambda keys: AVL(_build_balanced(keys, 0, len(keys), None)))
 
 
 def capture_inputs():
@@ -476,10 +926,20 @@ def main():
     print("\nEnter the value to be searched=", end="")
     val = int(input())
     node = tree.search(val)
+    print("Rank of", val, "=", tree.rank(val))
     if node is not None:
         tree.delete(node)
     tree.inorder_traversal()
 
+    n = AVL.size(tree.root)
+    if n > 0:
+        median = tree.select((n - 1) // 2)
+        print("\nMedian after deletion=", median.key)
+
+    print("\nEnter number of random operations to check against "
+          "a sorted list=", end="")
+    check(int(input()))
+
 
 if __name__ == "__main__":
     main()
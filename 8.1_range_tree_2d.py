@@ -0,0 +1,343 @@
+"""
+2D orthogonal range queries: report or count all points in
+[x1, x2] x [y1, y2]
+
+1. Static layered range tree (with fractional cascading)
+    - Balanced tree over the points sorted by x. Every node keeps
+        the points of its subtree sorted by y
+    - A query splits [x1, x2] into O(log n) canonical nodes. Instead
+        of binary searching y1 and y2 in each of them (O(log^2 n)),
+        only the root is searched and every node stores, for each
+        position of its y list, the matching position in the y list
+        of each child. Positions are then carried down in O(1)
+    - Count in O(log n), report in O(log n + k), O(n log n) space
+
+2. Dynamic k-d tree
+    - Splits alternately on x and y. Every node keeps the size and
+        bounding box of its subtree, so a subtree whose box lies
+        inside the query is reported (or counted) as a whole and
+        one outside it is skipped
+    - Supports inserts. Queries take O(sqrt(n) + k) on a balanced
+        tree, which is what building from a point array gives
+"""
+import random
+import time
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class RangeTreeNode:
+
+    def __init__(self, min_x, max_x, entries):
+        self.min_x = min_x
+        self.max_x = max_x
+        # (y, x) of all points in the subtree, sorted
+        self.entries = entries
+        self.left = None
+        self.right = None
+        # left_pos[i] = number of entries[:i] which went to the left
+        # child, i.e. position i carried down to the left child's
+        # entries. Same for right_pos
+        self.left_pos = None
+        self.right_pos = None
+
+
+class RangeTree2D:
+
+    def __init__(self, points):
+        """
+        Builds the tree from a list of (x, y) points in O(n log n)
+        """
+        pts = sorted(points)
+        self.root = None
+        self.root_ys = []
+        if pts:
+            self.root = RangeTree2D._build(pts, 0, len(pts))
+            self.root_ys = [e[0] for e in self.root.entries]
+
+    @staticmethod
+    def _build(pts, lo, hi):
+        """
+        Builds subtree over pts[lo:hi] (sorted by x) and returns it.
+        The y lists of the children are merged to get the y list of
+        the node and the cascading positions are recorded on the way
+        """
+        if hi - lo == 1:
+            x, y = pts[lo]
+            return RangeTreeNode(x, x, [(y, x)])
+
+        mid = (lo + hi) // 2
+        left = RangeTree2D._build(pts, lo, mid)
+        right = RangeTree2D._build(pts, mid, hi)
+
+        a, b = left.entries, right.entries
+        entries = []
+        left_pos = [0]
+        right_pos = [0]
+        i = j = 0
+        while i < len(a) or j < len(b):
+            if j >= len(b) or (i < len(a) and a[i] <= b[j]):
+                entries.append(a[i])
+                i = i + 1
+            else:
+                entries.append(b[j])
+                j = j + 1
+            left_pos.append(i)
+            right_pos.append(j)
+
+        node = RangeTreeNode(pts[lo][0], pts[hi - 1][0], entries)
+        node.left = left
+        node.right = right
+        node.left_pos = left_pos
+        node.right_pos = right_pos
+        return node
+
+    def _canonical(self, x1, x2, y1, y2):
+        """
+        Returns list of (node, start, end) such that the points in
+        the rectangle are exactly node.entries[start:end] over them
+        """
+        if self.root is None:
+            return []
+
+        found = []
+        stack = [(self.root,
+                  bisect_left(self.root_ys, y1),
+                  bisect_right(self.root_ys, y2))]
+        while stack:
+            node, start, end = stack.pop()
+            if start >= end or node.max_x < x1 or node.min_x > x2:
+                continue
+            if x1 <= node.min_x and node.max_x <= x2:
+                found.append((node, start, end))
+                continue
+            stack.append((node.right, node.right_pos[start],
+                          node.right_pos[end]))
+            stack.append((node.left, node.left_pos[start],
+                          node.left_pos[end]))
+        return found
+
+    def count(self, x1, x2, y1, y2):
+        return sum(end - start for _, start, end
+                   in self._canonical(x1, x2, y1, y2))
+
+    def report(self, x1, x2, y1, y2):
+        result = []
+        for node, start, end in self._canonical(x1, x2, y1, y2):
+            for y, x in node.entries[start:end]:
+                result.append((x, y))
+        return result
+
+
+class KDNode:
+
+    def __init__(self, point, axis):
+        self.point = point
+        self.axis = axis
+        self.left = None
+        self.right = None
+        self.size = 1
+        # bounding box of the subtree
+        self.min_x = self.max_x = point[0]
+        self.min_y = self.max_y = point[1]
+
+    def extend(self, point):
+        self.size = self.size + 1
+        self.min_x = min(self.min_x, point[0])
+        self.max_x = max(self.max_x, point[0])
+        self.min_y = min(self.min_y, point[1])
+        self.max_y = max(self.max_y, point[1])
+
+
+class KDTree:
+
+    def __init__(self, points=None):
+        """
+        Builds a balanced k-d tree by splitting at the median
+        """
+        self.root = None
+        if points:
+            self.root = KDTree._build(list(points), 0)
+
+    @staticmethod
+    def _build(points, axis):
+        if not points:
+            return None
+
+        points.sort(key=lambda p: p[axis])
+        mid = len(points) // 2
+        node = KDNode(points[mid], axis)
+        node.left = KDTree._build(points[:mid], 1 - axis)
+        node.right = KDTree._build(points[mid + 1:], 1 - axis)
+        for child in (node.left, node.right):
+            if child is not None:
+                node.size = node.size + child.size
+                node.min_x = min(node.min_x, child.min_x)
+                node.max_x = max(node.max_x, child.max_x)
+                node.min_y = min(node.min_y, child.min_y)
+                node.max_y = max(node.max_y, child.max_y)
+        return node
+
+    def insert(self, point):
+        """
+        Inserts point, growing the size and box of every node
+        on the way down
+        """
+        if self.root is None:
+            self.root = KDNode(point, 0)
+            return
+
+        curr = self.root
+        while True:
+            curr.extend(point)
+            if point[curr.axis] < curr.point[curr.axis]:
+                if curr.left is None:
+                    curr.left = KDNode(point, 1 - curr.axis)
+                    return
+                curr = curr.left
+            else:
+                if curr.right is None:
+                    curr.right = KDNode(point, 1 - curr.axis)
+                    return
+                curr = curr.right
+
+    def _query(self, x1, x2, y1, y2, report):
+        count = 0
+        result = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            if node.max_x < x1 or node.min_x > x2 or \
+                    node.max_y < y1 or node.min_y > y2:
+                # box is outside the query
+                continue
+            if x1 <= node.min_x and node.max_x <= x2 and \
+                    y1 <= node.min_y and node.max_y <= y2:
+                # box is inside the query
+                count = count + node.size
+                if report:
+                    KDTree._collect(node, result)
+                continue
+
+            x, y = node.point
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                count = count + 1
+                if report:
+                    result.append(node.point)
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+        return count, result
+
+    @staticmethod
+    def _collect(node, result):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            result.append(node.point)
+            if node.left is not None:
+                stack.append(node.left)
+            if node.right is not None:
+                stack.append(node.right)
+
+    def count(self, x1, x2, y1, y2):
+        return self._query(x1, x2, y1, y2, False)[0]
+
+    def report(self, x1, x2, y1, y2):
+        return self._query(x1, x2, y1, y2, True)[1]
+
+
+def brute_force_count(points, queries):
+    """
+    Filters all points for every query, vectorized with NumPy
+    when it is installed
+    """
+    if np is None:
+        return [sum(1 for x, y in points
+                    if x1 <= x <= x2 and y1 <= y <= y2)
+                for x1, x2, y1, y2 in queries]
+
+    xs = np.array([p[0] for p in points])
+    ys = np.array([p[1] for p in points])
+    return [int(np.count_nonzero((xs >= x1) & (xs <= x2) &
+                                 (ys >= y1) & (ys <= y2)))
+            for x1, x2, y1, y2 in queries]
+
+
+def benchmark(n, q=1000, side=0.05):
+    """
+    Times q square counting queries of the given side (as a fraction
+    of the coordinate space) on n random points
+    """
+    space = 10 ** 6
+    points = [(random.randrange(space), random.randrange(space))
+              for _ in range(n)]
+    width = int(space * side)
+    queries = []
+    for _ in range(q):
+        x1 = random.randrange(space)
+        y1 = random.randrange(space)
+        queries.append((x1, x1 + width, y1, y1 + width))
+
+    start = time.perf_counter()
+    range_tree = RangeTree2D(points)
+    rt_build = time.perf_counter() - start
+    start = time.perf_counter()
+    kd_tree = KDTree(points)
+    kd_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rt_counts = [range_tree.count(*r) for r in queries]
+    rt_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kd_counts = [kd_tree.count(*r) for r in queries]
+    kd_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bf_counts = brute_force_count(points, queries)
+    bf_time = time.perf_counter() - start
+
+    if rt_counts != bf_counts or kd_counts != bf_counts:
+        raise Exception("Range query results do not match brute force!")
+
+    brute = "NumPy brute force" if np is not None else "brute force"
+    print("Points=", n, "queries=", q)
+    print("Range tree:  build %.2fs, %.1f us/query"
+          % (rt_build, rt_time * 1e6 / q))
+    print("k-d tree:    build %.2fs, %.1f us/query"
+          % (kd_build, kd_time * 1e6 / q))
+    print("%s: %.1f us/query" % (brute, bf_time * 1e6 / q))
+
+
+def capture_inputs():
+    print("Enter points as x,y separated by spaces=", end="")
+    raw = input()
+    points = [tuple(int(c) for c in r.split(",")) for r in raw.split()]
+    print("Enter rectangle (x1 x2 y1 y2)=", end="")
+    raw = input()
+    rect = [int(r) for r in raw.split()]
+    return points, rect
+
+
+def main():
+    points, rect = capture_inputs()
+
+    range_tree = RangeTree2D(points)
+    kd_tree = KDTree(points)
+    print("Range tree=", sorted(range_tree.report(*rect)))
+    print("k-d tree=", sorted(kd_tree.report(*rect)))
+    print("Count=", range_tree.count(*rect))
+
+    print("Enter number of points to benchmark with=", end="")
+    n = int(input())
+    benchmark(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Log structured (LSM style) range index for append heavy keys
+
+When keys are timestamps arriving in increasing order, every insert
+into the BST of 8_range_index.py walks the whole right spine and the
+tree degenerates into a linked list: insert n keys in O(n^2).
+
+Here writes never touch a tree:
+
+1. insert appends the key to an in-memory buffer in O(1). While
+    keys keep arriving in order the buffer stays sorted for free
+2. A full buffer is frozen (sorted if needed) into an immutable
+    sorted run
+3. A background thread compacts runs: a run is merged with all the
+    newer runs once they add up to at least its own size. Like a
+    binary counter this keeps O(log n) runs and every key is merged
+    O(log n) times. Runs which do not overlap (the in-order case)
+    are merged by plain concatenation
+4. A range search binary searches [lo, hi] in every run and in the
+    buffer and merges the slices: O(r log n + k) for r runs
+
+So the cost of an insert does not depend on the size of the index.
+Duplicate keys are kept.
+
+Runs are stored as int64 arrays, so keys must be ints in the int64
+range. Timestamps go in as integer ticks, e.g. time.time_ns().
+"""
+import heapq
+import importlib
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+# runs are arrays of signed 64 bit keys
+KEY_MIN = -2 ** 63
+KEY_MAX = 2 ** 63 - 1
+
+
+class LSMIndex:
+
+    def __init__(self, buffer_limit=4096, background=True):
+        self.buffer_limit = buffer_limit
+        self.buffer = list()
+        self.buffer_sorted = True
+        # immutable sorted runs, oldest first
+        self.runs = list()
+        self.size = 0
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._compacting = False
+        self._closed = False
+        self._compactor = None
+        if background:
+            self._compactor = threading.Thread(target=self._compact_loop,
+                                               daemon=True)
+            self._compactor.start()
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, key):
+        """
+        Appends key to the write buffer, flushing it as a new run
+        once it is full. The key is checked before anything changes,
+        so a rejected key leaves the index as it was
+        """
+        if not isinstance(key, int) or not KEY_MIN <= key <= KEY_MAX:
+            raise Exception("Keys must be int64 integers, got " + repr(key))
+        buffer = self.buffer
+        if buffer and key < buffer[-1]:
+            self.buffer_sorted = False
+        buffer.append(key)
+        self.size = self.size + 1
+        if len(buffer) >= self.buffer_limit:
+            self.flush()
+
+    def flush(self):
+        """
+        Freezes the buffer into a sorted run
+        """
+        if not self.buffer:
+            return
+        if not self.buffer_sorted:
+            self.buffer.sort()
+        run = array("q", self.buffer)
+
+        with self._lock:
+            self.runs.append(run)
+            self.buffer = list()
+            self.buffer_sorted = True
+            self._wakeup.notify()
+
+        if self._compactor is None:
+            self.compact()
+
+    @staticmethod
+    def _merge(runs):
+        """
+        Merges sorted runs into one. Runs that do not overlap are
+        simply concatenated. Otherwise the concatenation is sorted,
+        which timsort does as a merge of the already sorted runs
+        """
+        merged = array("q")
+        for run in runs:
+            merged.extend(run)
+        disjoint = all(runs[i][-1] <= runs[i + 1][0]
+                       for i in range(len(runs) - 1))
+        if not disjoint:
+            merged = array("q", sorted(merged))
+        return merged
+
+    def _pick_compaction(self):
+        """
+        Returns the start index of the suffix of runs to merge, None
+        if there is nothing to do. That is the oldest run which is
+        no bigger than all the newer runs put together. Keeping every
+        run bigger than the sum of the newer ones means run sizes at
+        least double going back in time, so there are O(log n) runs
+        """
+        newer = 0
+        suffix_sizes = list()
+        for run in reversed(self.runs):
+            suffix_sizes.append(newer)
+            newer = newer + len(run)
+        suffix_sizes.reverse()
+
+        for j in range(len(self.runs) - 1):
+            if len(self.runs[j]) <= suffix_sizes[j]:
+                return j
+        return None
+
+    def compact(self):
+        """
+        Runs compaction rounds till the runs settle. The merge itself
+        happens outside the lock: runs are immutable and only the
+        compactor removes them, so runs[j:k] is still there when the
+        merged run replaces it
+        """
+        while True:
+            with self._lock:
+                j = self._pick_compaction()
+                if j is None:
+                    return
+                k = len(self.runs)
+                group = self.runs[j:k]
+                self._compacting = True
+
+            merged = LSMIndex._merge(group)
+
+            with self._lock:
+                self.runs[j:k] = [merged]
+                self._compacting = False
+                self._wakeup.notify_all()
+
+    def _compact_loop(self):
+        while True:
+            with self._lock:
+                while not self._closed and \
+                        self._pick_compaction() is None:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+            self.compact()
+
+    def wait_for_compaction(self):
+        """
+        Blocks till the background compactor has caught up
+        """
+        if self._compactor is None:
+            self.compact()
+            return
+
+        with self._lock:
+            while self._compacting or \
+                    self._pick_compaction() is not None:
+                self._wakeup.wait()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify_all()
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def _sources(self):
+        """
+        Returns the runs and a sorted view of the buffer
+        """
+        with self._lock:
+            runs = list(self.runs)
+            buffer = self.buffer
+            if not self.buffer_sorted:
+                buffer = sorted(buffer)
+        return runs + [buffer]
+
+    def range_search(self, lo, hi):
+        """
+        Returns sorted list of keys in the closed set [lo, hi]
+        """
+        slices = list()
+        for source in self._sources():
+            start = bisect_left(source, lo)
+            end = bisect_right(source, hi)
+            if start < end:
+                slices.append(source[start:end])
+
+        if len(slices) == 1:
+            return list(slices[0])
+        return list(heapq.merge(*slices))
+
+    def range_count(self, lo, hi):
+        count = 0
+        for source in self._sources():
+            count = count + max(0, bisect_right(source, hi) -
+                                bisect_left(source, lo))
+        return count
+
+    def search(self, key):
+        """
+        Returns True if key is present
+        """
+        return self.range_count(key, key) > 0
+
+
+def benchmark(n, chunks=10, bst_keys=5000):
+    """
+    Inserts n increasing timestamps (with a little jitter) and reports
+    insert throughput per chunk as the index grows. For comparison
+    the BST of 8_range_index.py is fed the first bst_keys of them
+    """
+    keys = [i * 10 + random.randrange(15) for i in range(n)]
+
+    index = LSMIndex()
+    chunk = n // chunks
+    for c in range(chunks):
+        start = time.perf_counter()
+        for k in keys[c * chunk:(c + 1) * chunk]:
+            index.insert(k)
+        elapsed = time.perf_counter() - start
+        print("LSM: keys %8d-%8d  %9.0f inserts/s  runs=%d"
+              % (c * chunk, (c + 1) * chunk, chunk / elapsed,
+                 len(index.runs)))
+    index.flush()
+    index.wait_for_compaction()
+    lo = keys[n // 2]
+    print("Range search of 1000 keys returned",
+          len(index.range_search(lo, lo + 10000)), "keys")
+    index.close()
+
+    range_index = importlib.import_module("8_range_index")
+    bst = range_index.BST(None)
+    chunk = bst_keys // chunks
+    for c in range(chunks):
+        start = time.perf_counter()
+        for k in keys[c * chunk:(c + 1) * chunk]:
+            bst.insert(k)
+        elapsed = time.perf_counter() - start
+        print("BST: keys %8d-%8d  %9.0f inserts/s"
+              % (c * chunk, (c + 1) * chunk, chunk / elapsed))
+
+
+def capture_inputs():
+    print("Enter elements to be inserted in the index=", end="")
+    raw = input()
+    arr = [int(r) for r in raw.split()]
+    print("Enter range (lo hi) within which to perform search=", end="")
+    raw = input()
+    lohi = [int(r) for r in raw.split()]
+    return arr, lohi[0], lohi[1]
+
+
+def main():
+    arr, lo, hi = capture_inputs()
+    index = LSMIndex(buffer_limit=4)
+    for a in arr:
+        index.insert(a)
+
+    print(index.range_search(lo, hi))
+    index.close()
+
+    print("Enter number of keys to benchmark with=", end="")
+    n = int(input())
+    benchmark(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Range index partitioned by key range across worker processes
+
+A single BST of 8_range_index.py lives in one process, which caps
+both its size and the query throughput at one core.
+
+- The key space is cut at boundaries b[0] < b[1] < ... and shard i
+    holds the keys in [b[i - 1], b[i]). Every shard is a worker
+    process holding its own BST (multiset mode)
+- Inserts are routed to one shard by binary searching the boundaries
+- A range query [lo, hi] is sent only to the shards overlapping it
+    (scatter) and their sorted answers are concatenated in shard
+    order (gather). Requests to different shards are all sent before
+    any reply is read, so the shards work on them in parallel
+- The coordinator tracks the size of every shard. When the biggest
+    shard grows past skew_ratio times the average, the keys are
+    pulled back, new boundaries are picked at the quantiles and the
+    shards are reloaded (in middle-first order, so that their trees
+    come out balanced)
+"""
+import importlib
+import multiprocessing
+import os
+import random
+import time
+from bisect import bisect_right
+
+
+def _balanced_order(keys):
+    """
+    Yields sorted keys middle first (level by level), so that plain
+    BST inserts in this order give a balanced tree
+    """
+    ranges = [(0, len(keys))]
+    while ranges:
+        next_ranges = list()
+        for lo, hi in ranges:
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            yield keys[mid]
+            next_ranges.append((lo, mid))
+            next_ranges.append((mid + 1, hi))
+        ranges = next_ranges
+
+
+def _worker(conn):
+    """
+    Serves requests for one shard till it is told to stop
+    """
+    range_index = importlib.import_module("8_range_index")
+    bst = range_index.BST(None, multiset=True)
+    while True:
+        request = conn.recv()
+        op = request[0]
+        if op == "insert":
+            for key in request[1]:
+                bst.insert(key)
+            conn.send(None)
+        elif op == "load":
+            bst = range_index.BST(None, multiset=True)
+            for key in _balanced_order(request[1]):
+                bst.insert(key)
+            conn.send(None)
+        elif op == "range_many":
+            if request[2]:
+                conn.send([bst.range_count(lo, hi)
+                           for lo, hi in request[1]])
+            else:
+                conn.send([bst.range_search(lo, hi)
+                           for lo, hi in request[1]])
+        elif op == "dump":
+            conn.send(bst.sorted_keys())
+        elif op == "stop":
+            conn.send(None)
+            return
+
+
+class PartitionedIndex:
+
+    def __init__(self, num_shards, boundaries=None, skew_ratio=1.5,
+                 min_rebalance_size=1024):
+        """
+        boundaries are the num_shards - 1 split keys. Without them the
+        first rebalance picks them from the data
+        """
+        self.num_shards = num_shards
+        self.boundaries = list(boundaries) if boundaries is not None \
+            else [0] * (num_shards - 1)
+        if len(self.boundaries) != num_shards - 1:
+            raise Exception("Need exactly num_shards - 1 boundaries!")
+        self.skew_ratio = skew_ratio
+        self.min_rebalance_size = min_rebalance_size
+        self.sizes = [0] * num_shards
+        self.rebalances = 0
+        # total size at the last rebalance. Rebalancing again needs
+        # the index to grow by half since then, otherwise a skew that
+        # re-cutting cannot fix (one very frequent key) would make
+        # every insert rebalance
+        self.rebalanced_at = 0
+
+        self.conns = list()
+        self.workers = list()
+        for _ in range(num_shards):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_worker,
+                                             args=(child_conn,),
+                                             daemon=True)
+            worker.start()
+            self.conns.append(parent_conn)
+            self.workers.append(worker)
+
+    def shard_of(self, key):
+        return bisect_right(self.boundaries, key)
+
+    def _scatter_gather(self, requests):
+        """
+        requests maps shard -> request. All are sent before any
+        reply is read. Returns shard -> reply
+        """
+        for shard, request in requests.items():
+            self.conns[shard].send(request)
+        return {shard: self.conns[shard].recv() for shard in requests}
+
+    def insert_many(self, keys):
+        """
+        Routes a batch of keys to their shards
+        """
+        batches = dict()
+        for key in keys:
+            batches.setdefault(self.shard_of(key), list()).append(key)
+        self._scatter_gather({shard: ("insert", batch)
+                              for shard, batch in batches.items()})
+        for shard, batch in batches.items():
+            self.sizes[shard] = self.sizes[shard] + len(batch)
+        self._maybe_rebalance()
+
+    def insert(self, key):
+        self.insert_many([key])
+
+    def __len__(self):
+        return sum(self.sizes)
+
+    def _overlapping(self, lo, hi):
+        return range(self.shard_of(lo), self.shard_of(hi) + 1)
+
+    def range_search_many(self, queries, counts_only=False):
+        """
+        Answers a batch of (lo, hi) queries. Every shard gets the
+        queries overlapping it in a single message
+        """
+        per_shard = dict()
+        for i, (lo, hi) in enumerate(queries):
+            if lo > hi:
+                continue
+            for shard in self._overlapping(lo, hi):
+                per_shard.setdefault(shard, list()).append(i)
+
+        replies = self._scatter_gather({
+            shard: ("range_many", [queries[i] for i in idx], counts_only)
+            for shard, idx in per_shard.items()})
+
+        results = [0 if counts_only else list() for _ in queries]
+        # shards are visited in key order, so lists stay sorted
+        for shard in sorted(per_shard):
+            for i, answer in zip(per_shard[shard], replies[shard]):
+                results[i] = results[i] + answer
+        return results
+
+    def range_search(self, lo, hi):
+        return self.range_search_many([(lo, hi)])[0]
+
+    def range_count(self, lo, hi):
+        return self.range_search_many([(lo, hi)], counts_only=True)[0]
+
+    def _maybe_rebalance(self):
+        total = sum(self.sizes)
+        if self.num_shards < 2 or total < self.min_rebalance_size or \
+                total < 1.5 * self.rebalanced_at:
+            return
+        if max(self.sizes) > self.skew_ratio * total / self.num_shards:
+            self.rebalance()
+
+    def rebalance(self):
+        """
+        Pulls all keys back, re-cuts the boundaries at the quantiles
+        and reloads every shard. Equal keys always go to the same
+        shard, so shards can stay uneven under heavy repetition
+        """
+        dumps = self._scatter_gather({shard: ("dump",)
+                                      for shard in range(self.num_shards)})
+        keys = list()
+        for shard in range(self.num_shards):
+            keys.extend(dumps[shard])
+        if not keys:
+            return
+
+        n = len(keys)
+        self.boundaries = [keys[(i * n) // self.num_shards]
+                           for i in range(1, self.num_shards)]
+
+        parts = [list() for _ in range(self.num_shards)]
+        start = 0
+        for shard in range(self.num_shards):
+            if shard < self.num_shards - 1:
+                end = start
+                while end < n and keys[end] < self.boundaries[shard]:
+                    end = end + 1
+            else:
+                end = n
+            parts[shard] = keys[start:end]
+            start = end
+
+        self._scatter_gather({shard: ("load", parts[shard])
+                              for shard in range(self.num_shards)})
+        self.sizes = [len(p) for p in parts]
+        self.rebalances = self.rebalances + 1
+        self.rebalanced_at = n
+
+    def close(self):
+        self._scatter_gather({shard: ("stop",)
+                              for shard in range(self.num_shards)})
+        for worker in self.workers:
+            worker.join()
+
+
+def benchmark(n, q=20000, max_shards=8):
+    """
+    Query throughput (batched range counts) as the number of shards
+    grows, on n random keys
+    """
+    keys = [random.randrange(n * 10) for _ in range(n)]
+    queries = list()
+    for _ in range(q):
+        lo = random.randrange(n * 10)
+        queries.append((lo, lo + 50))
+
+    print("CPUs=", os.cpu_count())
+    shards = 1
+    while shards <= max_shards:
+        index = PartitionedIndex(shards)
+        for i in range(0, n, 10000):
+            index.insert_many(keys[i:i + 10000])
+        index.rebalance()
+
+        start = time.perf_counter()
+        index.range_search_many(queries, counts_only=True)
+        elapsed = time.perf_counter() - start
+        print("shards=%d  %9.0f queries/s  shard sizes=%s"
+              % (shards, q / elapsed, index.sizes))
+        index.close()
+        shards = shards * 2
+
+
+def capture_inputs():
+    print("Enter number of shards=", end="")
+    shards = int(input())
+    print("Enter elements to be inserted=", end="")
+    raw = input()
+    arr = [int(r) for r in raw.split()]
+    print("Enter range (lo hi) within which to perform search=", end="")
+    raw = input()
+    lohi = [int(r) for r in raw.split()]
+    return shards, arr, lohi[0], lohi[1]
+
+
+def main():
+    shards, arr, lo, hi = capture_inputs()
+    index = PartitionedIndex(shards, min_rebalance_size=1)
+    index.insert_many(arr)
+    print(index.range_search(lo, hi))
+    print("Shard boundaries=", index.boundaries, "sizes=", index.sizes)
+    index.close()
+
+    print("Enter number of keys to benchmark with=", end="")
+    n = int(input())
+    benchmark(n)
+
+
+if __name__ == "__main__":
+    main()
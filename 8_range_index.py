@@ -4,46 +4,218 @@ Support a special kind of range index, to speed up the operations.
 1. The range index must support fast (sub-linear) insertions
 2. The range index must also be able to compute the minimum and 
     maximum over all keys quickly (in sub-linear time).
+
+Queries cost O(h) (plus O(k) to list k keys), h being the height
+of the tree. The tree is a plain, unbalanced BST, so h is O(log n)
+only for keys arriving in random order. Keys arriving sorted, like
+timestamps, give a linked list shaped tree where h = n, and then
+inserts and queries are O(n). 6_avl.py keeps the height O(log n),
+and 8.2_lsm_index.py is built for append heavy keys.
+
+In multiset mode a key inserted again is not given a new node but
+bumps the count of its existing node, so memory and depth track the
+distinct keys. Every query counts a key as many times as it was
+inserted.
 """
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class Node:
 
-    def __init__(self, key, left, right, parent):
+    def __init__(self, key, left, right, parent, value=None):
         self.key = key
         self.left = left
         self.right = right
         self.parent = parent
+        # value attached to the key, the key itself by default
+        self.value = key if value is None else value
+        # number of times the key was inserted (multiset mode) and
+        # the sum, min and max of the values attached to those copies
+        self.count = 1
+        self.own_sum = self.value
+        self.own_min = self.value
+        self.own_max = self.value
+        # number of keys in the subtree rooted here (inclusive),
+        # counting every copy
+        self.size = 1
+        # sum, min and max of the values in the subtree
+        self.agg_sum = self.value
+        self.agg_min = self.value
+        self.agg_max = self.value
+
+    def pull(self):
+        """
+        Recomputes subtree size and aggregates from own copies
+        and the children
+        """
+        self.size = self.count
+        self.agg_sum = self.own_sum
+        self.agg_min = self.own_min
+        self.agg_max = self.own_max
+        for child in (self.left, self.right):
+            if child is not None:
+                self.size = self.size + child.size
+                self.agg_sum = self.agg_sum + child.agg_sum
+                self.agg_min = min(self.agg_min, child.agg_min)
+                self.agg_max = max(self.agg_max, child.agg_max)
+
+
+class FrozenIndex:
+    """
+    Immutable sorted array snapshot of the range index, for read
+    mostly periods. Every lookup is a binary search over one flat
+    array and batches of probes are answered by a single vectorized
+    searchsorted call instead of a tree walk per probe.
+
+    Keys inserted into the BST after freeze() are buffered in
+    pending and merged in by refresh(). Only the latest snapshot of a
+    BST is fed: once freeze() is called again, an earlier snapshot
+    gets no more pending keys and stays as of its last refresh().
+    A multiset snapshot repeats every key as many times as it was
+    inserted
+    """
+
+    def __init__(self, keys, multiset=False):
+        self.keys = keys
+        self.multiset = multiset
+        self.pending = list()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def contains(self, probes):
+        """
+        Returns a bool array telling which probes are keys
+        """
+        probes = np.asarray(probes)
+        pos = np.searchsorted(self.keys, probes, side="left")
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == probes[found]
+        return found
+
+    def bounds(self, los, his):
+        """
+        Returns arrays (starts, ends) such that keys[starts[i]:ends[i]]
+        are the keys in [los[i], his[i]]
+        """
+        starts = np.searchsorted(self.keys, np.asarray(los), side="left")
+        ends = np.searchsorted(self.keys, np.asarray(his), side="right")
+        return starts, np.maximum(starts, ends)
+
+    def counts(self, los, his):
+        """
+        Returns array with the number of keys in each [los[i], his[i]]
+        """
+        starts, ends = self.bounds(los, his)
+        return ends - starts
+
+    def range_search(self, lo, hi):
+        """
+        Returns the keys in [lo, hi] as a view of the snapshot
+        """
+        start = np.searchsorted(self.keys, lo, side="left")
+        end = np.searchsorted(self.keys, hi, side="right")
+        return self.keys[start:max(start, end)]
+
+    def refresh(self):
+        """
+        Merges keys written since the snapshot was taken
+        """
+        if self.pending:
+            pending = np.array(self.pending)
+            keys = self.keys
+            if len(keys) == 0:
+                # an empty snapshot has no dtype of its own, take the
+                # one of the keys so that merging never converts them
+                keys = keys.astype(pending.dtype)
+            if self.multiset:
+                self.keys = np.sort(np.concatenate((keys, pending)),
+                                    kind="mergesort")
+            else:
+                self.keys = np.union1d(keys, pending)
+            self.pending = list()
+        return self
 
 
 class BST:
 
-    def __init__(self, root):
+    def __init__(self, root, multiset=False):
         self.root = root
+        self.multiset = multiset
+        # snapshot handed out by freeze(), which gets told
+        # about later inserts
+        self.frozen = None
 
-    def insert(self, val):
+    def freeze(self):
         """
-        Inserts a given val in the BST tree
+        Returns an immutable sorted NumPy snapshot of the keys.
+        Later inserts are buffered on it till refresh(). Freezing
+        again replaces it: the previous snapshot is no longer fed
+        """
+        if np is None:
+            raise Exception("NumPy is needed to freeze the range index!")
+        keys = self.sorted_keys()
+        if keys:
+            keys = np.array(keys)
+        else:
+            # np.array([]) would be float64 and turn int keys merged
+            # in later into floats
+            keys = np.array(keys, dtype=np.int64)
+        self.frozen = FrozenIndex(keys, self.multiset)
+        return self.frozen
+
+    def insert(self, val, value=None):
+        """
+        Inserts a given val in the BST tree, with an attached
+        value (defaults to val) which is aggregated over ranges.
+
+        If val is already present, multiset mode counts one more
+        copy of it (and of the value) on the existing node, while
+        set mode just replaces the attached value
         """
-        new_node = Node(val, None, None, None)
         insertion_point = self.find_insertion_point(val)
 
-        if insertion_point is None:
-            # insert as root
-            self.root = new_node
+        if insertion_point is not None and insertion_point.key == val:
+            node = insertion_point
+            if value is None:
+                value = val
+            if self.multiset:
+                node.count = node.count + 1
+                node.own_sum = node.own_sum + value
+                node.own_min = min(node.own_min, value)
+                node.own_max = max(node.own_max, value)
+                if self.frozen is not None:
+                    self.frozen.pending.append(val)
+            else:
+                node.value = value
+                node.own_sum = node.own_min = node.own_max = value
         else:
-            if val < insertion_point.key:
-                insertion_point.left = new_node
+            node = Node(val, None, None, None, value)
+            if insertion_point is None:
+                # insert as root
+                self.root = node
+            elif val < insertion_point.key:
+                insertion_point.left = node
             else:
-                insertion_point.right = new_node
+                insertion_point.right = node
+            node.parent = insertion_point
+            if self.frozen is not None:
+                self.frozen.pending.append(val)
 
-        new_node.parent = insertion_point
+        # refresh size and aggregates of the node and its ancestors
+        curr = node
+        while curr is not None:
+            curr.pull()
+            curr = curr.parent
 
     def find_insertion_point(self, val):
         """
         Returns the parent node whose child will this val node become.
         If the val node would make it as root of the tree then None 
-        is returned.
+        is returned. If val is already present, its node is returned
         """
         prev = None
         curr = self.root
@@ -56,7 +228,7 @@ class BST:
                 curr = curr.left
             else:
                 # current key is equal to val
-                break
+                return curr
 
         return prev
 
@@ -64,68 +236,223 @@ class BST:
         """
         Performs a range search and returns list of
         values which are between closed set [lo, hi]
+
+        Walks the tree in order but only descends into a subtree
+        when it can hold keys in [lo, hi]: left children only if
+        key > lo and right children only if key < hi. The nodes
+        visited are the two boundary paths plus the k reported
+        nodes, so this is O(h + k) instead of scanning the whole
+        subtree of the lowest common ancestor
         """
-        curr = self.root
         answers = list()
+        stack = list()
+        curr = self.root
+        while stack or curr is not None:
+            # go down the left spine, skipping subtrees below lo
+            while curr is not None:
+                stack.append(curr)
+                if curr.key > lo:
+                    curr = curr.left
+                else:
+                    curr = None
 
-        # step 1: simulate an insertion of lo and hi
-        #           and find the insertion points
-        lo_insertion_pt = self.find_insertion_point(lo)
-        hi_insertion_pt = self.find_insertion_point(hi)
+            node = stack.pop()
+            if node.key > hi:
+                # everything left on the stack is even larger
+                break
+            if node.key >= lo:
+                answers.extend([node.key] * node.count)
+            curr = node.right
 
-        if lo_insertion_pt is not None and \
-                hi_insertion_pt is not None:
-            # step 2: Find lowest common ancestor for lo and hi
-            #           insertion pts.
-            lca = self.find_lowest_common_ancestor(lo_insertion_pt,
-                                                   hi_insertion_pt)
+        return answers
 
-            # step 3: Perform an inorder traversal of the LAC
-            #           while doing the range check on the keys
-            answers = self.inorder_traversal(lca, lo, hi)
+    @staticmethod
+    def _size(node):
+        if node is None:
+            return 0
+        return node.size
 
-        return answers
+    def rank(self, val, inclusive=False):
+        """
+        Returns the number of keys < val (<= val if inclusive)
+        using the subtree sizes, in O(h)
+        """
+        rank = 0
+        curr = self.root
+        while curr is not None:
+            if curr.key < val or (inclusive and curr.key == val):
+                rank = rank + BST._size(curr.left) + curr.count
+                curr = curr.right
+            else:
+                curr = curr.left
+        return rank
 
-    def find_lowest_common_ancestor(self, lo_insertion_pt,
-                                    hi_insertion_pt):
+    def range_count(self, lo, hi):
+        """
+        Returns the number of keys in the closed set [lo, hi]
+        without listing them, in O(h)
         """
-        Finds lowest common ancestor
+        if lo > hi:
+            return 0
+        return self.rank(hi, inclusive=True) - self.rank(lo)
 
-        Start from root keep going in the direction where both lo and hi exist.
-        If we reach a point in the tree where lo and hi are not on one side of 
-        the subtree then we break.
+    def min(self):
+        """
+        Returns the minimum key, None if the index is empty
         """
         curr = self.root
+        if curr is None:
+            return None
+        while curr.left is not None:
+            curr = curr.left
+        return curr.key
+
+    def max(self):
+        """
+        Returns the maximum key, None if the index is empty
+        """
+        curr = self.root
+        if curr is None:
+            return None
+        while curr.right is not None:
+            curr = curr.right
+        return curr.key
+
+    @staticmethod
+    def _combine(agg, count, total, minn, maxx):
+        """
+        Merges aggregate (count, sum, min, max) with another one
+        """
+        if count == 0:
+            return agg
+        if agg[0] == 0:
+            return count, total, minn, maxx
+        return (agg[0] + count, agg[1] + total,
+                min(agg[2], minn), max(agg[3], maxx))
+
+    @staticmethod
+    def _add_subtree(agg, node):
+        if node is None:
+            return agg
+        return BST._combine(agg, node.size, node.agg_sum,
+                            node.agg_min, node.agg_max)
+
+    @staticmethod
+    def _add_node(agg, node):
+        return BST._combine(agg, node.count, node.own_sum,
+                            node.own_min, node.own_max)
+
+    def range_aggregate(self, lo, hi):
+        """
+        Returns (count, sum, min, max) of the values attached to
+        keys in the closed set [lo, hi]. min and max are None for
+        an empty range.
+
+        1. Walk down to the split node, the first node in [lo, hi]
+        2. From its left child follow the path to lo. Every node on
+            it with key >= lo is in range along with its whole
+            right subtree, whose aggregate is read off in O(1)
+        3. Symmetrically from its right child towards hi
+
+        Only O(h) nodes are touched and no key list is built
+        """
+        empty = (0, 0, None, None)
+        split = self.root
+        while split is not None:
+            if split.key < lo:
+                split = split.right
+            elif split.key > hi:
+                split = split.left
+            else:
+                break
+        if split is None:
+            return empty
+
+        agg = BST._add_node(empty, split)
+
+        curr = split.left
         while curr is not None:
-            if lo_insertion_pt.key < curr.key and \
-                    hi_insertion_pt.key < curr.key:
+            if curr.key >= lo:
+                agg = BST._add_node(agg, curr)
+                agg = BST._add_subtree(agg, curr.right)
                 curr = curr.left
-            elif lo_insertion_pt.key > curr.key and \
-                    hi_insertion_pt.key > curr.key:
+            else:
+                curr = curr.right
+
+        curr = split.right
+        while curr is not None:
+            if curr.key <= hi:
+                agg = BST._add_node(agg, curr)
+                agg = BST._add_subtree(agg, curr.left)
                 curr = curr.right
             else:
-                break
-        return curr
+                curr = curr.left
 
-    def inorder_traversal(self, subtree, lo, hi):
+        return agg
+
+    def sorted_keys(self):
+        """
+        Returns all keys in sorted order, via an iterative
+        inorder walk in O(n)
         """
-        Performs inorder traversal by limiting keys to be between
-        lo and hi (inclusive)
+        keys = list()
+        stack = list()
+        curr = self.root
+        while stack or curr is not None:
+            while curr is not None:
+                stack.append(curr)
+                curr = curr.left
+            node = stack.pop()
+            keys.extend([node.key] * node.count)
+            curr = node.right
+        return keys
+
+    def range_search_many(self, queries, counts_only=False):
         """
-        result = list()
-        BST._rec_inorder_traversal(subtree, lo, hi, result)
-        return result
+        Answers a batch of (lo, hi) range queries in one sweep
+        instead of walking from the root for every query.
 
-    @staticmethod
-    def _rec_inorder_traversal(subtree, lo, hi, result):
-        if subtree is None:
-            return
+        1. Take a sorted snapshot of the keys with one inorder
+            walk, O(n)
+        2. Sort all query endpoints, O(q log q)
+        3. Merge the endpoints with the sorted keys to get, for
+            every lo, the number of keys < lo and for every hi, the
+            number of keys <= hi. Those are the slice bounds of the
+            query in the snapshot, O(n + q)
+
+        Returns per query the list of keys in [lo, hi], or just the
+        count if counts_only. Total O(n + q log q + output)
+        """
+        keys = self.sorted_keys()
+
+        # (endpoint, is_hi, query index). Endpoints are visited in
+        # increasing order so pos only ever moves forward
+        endpoints = list()
+        for i, (lo, hi) in enumerate(queries):
+            endpoints.append((lo, 0, i))
+            endpoints.append((hi, 1, i))
+        endpoints.sort()
+
+        starts = [0] * len(queries)
+        ends = [0] * len(queries)
+        pos = 0
+        for value, is_hi, i in endpoints:
+            if is_hi:
+                # skip keys <= hi
+                while pos < len(keys) and keys[pos] <= value:
+                    pos = pos + 1
+                ends[i] = pos
+            else:
+                # skip keys < lo
+                while pos < len(keys) and keys[pos] < value:
+                    pos = pos + 1
+                starts[i] = pos
 
-        BST._rec_inorder_traversal(subtree.left, lo, hi, result)
-        if subtree.key >= lo and \
-                subtree.key <= hi:
-            result.append(subtree.key)
-        BST._rec_inorder_traversal(subtree.right, lo, hi, result)
+        # an empty query (lo > hi) ends up with ends < starts
+        if counts_only:
+            return [max(0, ends[i] - starts[i])
+                    for i in range(len(queries))]
+        return [keys[starts[i]:ends[i]] for i in range(len(queries))]
 
 
 def capture_inputs():
@@ -140,11 +467,14 @@ def capture_inputs():
 
 def main():
     arr, lo, hi = capture_inputs()
-    bst = BST(None)
+    bst = BST(None, multiset=True)
     for a in arr:
         bst.insert(a)
 
     print(bst.range_search(lo, hi))
+    print("Keys in range=", bst.range_count(lo, hi))
+    count, total, minn, maxx = bst.range_aggregate(lo, hi)
+    print("Sum=", total, "Min=", minn, "Max=", maxx)
 
 
 if __name__ == "__main__":
@@ -15,12 +15,33 @@ E.g. problems
     many blooming flowers you will notice on a specific
     date
 
+Bentley-Ottmann: reports all k intersections of n segments in
+O((n + k) log n)
+1. Events are kept on a heap ordered by (x, y): the segment ends
+    and the intersection points found so far
+2. The segments crossing the sweep line are kept on an AVL tree
+    ordered by their y at the current sweep x (ties broken by
+    slope, i.e. by the order just right of the sweep line)
+3. Only segments adjacent on the sweep line can intersect next, so
+    whenever two segments become adjacent (insertion, deletion of
+    the one in between or a swap) their intersection, if it lies
+    ahead of the sweep, is scheduled as an event
+4. At an event point all segments meeting there are reported and
+    the crossing ones swap places: they are taken out and put back
+    in the order right of the point
+Coordinates are exact fractions, so touching and shared end points
+are reported too. Overlapping collinear segments are not.
+
 PS: Does not handle the case when one of the lines is a vertical
     line
 """
 
+import heapq
+import random
+import time
 from abc import ABC, abstractmethod
 from enum import Enum
+from fractions import Fraction
 
 
 class Side(Enum):
@@ -42,11 +63,15 @@ class Node(ABC):
 
 class Coord(Node):
 
+    # x of the sweep line, which orders the segments in the tree
+    sweep_x = 0
+
     def __init__(self, x, y, side=None, otherCoord=None):
         self.x = x
         self.y = y
         self.side = side
         self.otherCoord = otherCoord
+        self._slope = None
 
     def assignSideTags(self):
         """
@@ -57,6 +82,9 @@ class Coord(Node):
                 "Other coord is not set on this coordinate.",
                 "Unable to assign side tags!")
 
+        if self.x == self.otherCoord.x:
+            raise Exception("Vertical line segments are not supported!")
+
         if self.x < self.otherCoord.x:
             self.side = Side.LEFT
             self.otherCoord.side = Side.RIGHT
@@ -64,53 +92,53 @@ class Coord(Node):
             self.side = Side.RIGHT
             self.otherCoord.side = Side.LEFT
 
+    def slope(self):
+        if self._slope is None:
+            self._slope = Fraction(self.otherCoord.y - self.y) / \
+                (self.otherCoord.x - self.x)
+        return self._slope
+
+    def y_at(self, x):
+        """
+        y of the line segment at the given x
+        """
+        return self.y + self.slope() * (x - self.x)
+
     def check_intersection(self, coord_other):
+        """
+        Returns (True, (x, y)) if the line segments meet, end points
+        included, else (False, None). Parallel segments never meet.
 
+        With p + t * r the points of this segment and q + u * s those
+        of the other one, they meet where t and u both lie in [0, 1]
+        """
         if coord_other is None:
-            return False
-
-        line1_slope = (self.otherCoord.y - self.y)/(self.otherCoord.x - self.x)
-        line2_slope = (coord_other.otherCoord.y - coord_other.y) / \
-            (coord_other.otherCoord.x - coord_other.x)
-
-        # line equation => y - y1 = m(x - x1) or
-        #                  y = m(x - x1) + y1
-        # line1_equation = line1_slope(x - self.x) + self.y
-        # line2_equation = line2_slope(x - coord_other.x) + coord_other.y
-
-        # intersection_pt_x => line1_slope*x - line2_slope*x = coord_other.y - self.y + line2_slope*coord_other.x + line1_slope*self.x
-        intersection_pt_x = (coord_other.y - self.y + line2_slope *
-                             coord_other.x + line1_slope*self.x)/(line1_slope - line2_slope)
-
-        # Put above value of x in any one of the equations
-        # to find intersection pt y
-        intersection_pt_y = line1_slope(intersection_pt_x - self.x) + self.y
-
-        # intersection pt should lie between the line segments
-        xmin = min(self.x, self.otherCoord.x)
-        xmax = max(self.x, self.otherCoord.x)
-        ymin = min(self.y, self.otherCoord.y)
-        ymax = max(self.y, self.otherCoord.y)
-
-        xmin_coord_other = min(coord_other.x, coord_other.otherCoord.x)
-        xmax_coord_other = max(coord_other.x, coord_other.otherCoord.x)
-        ymin_coord_other = min(coord_other.y, coord_other.otherCoord.y)
-        ymax_coord_other = max(coord_other.y, coord_other.otherCoord.y)
-
-        if intersection_pt_x >= xmin and \
-                intersection_pt_x <= xmax and \
-                intersection_pt_y >= ymin and \
-                intersection_pt_y <= ymax and \
-                intersection_pt_x >= xmin_coord_other and \
-                intersection_pt_x <= xmax_coord_other and \
-                intersection_pt_y >= ymin_coord_other and \
-                intersection_pt_y <= ymax_coord_other:
-            return True, tuple(intersection_pt_x, intersection_pt_y)
+            return False, None
+
+        rx = self.otherCoord.x - self.x
+        ry = self.otherCoord.y - self.y
+        sx = coord_other.otherCoord.x - coord_other.x
+        sy = coord_other.otherCoord.y - coord_other.y
+        qpx = coord_other.x - self.x
+        qpy = coord_other.y - self.y
+
+        denom = rx * sy - ry * sx
+        if denom == 0:
+            return False, None
+
+        t = Fraction(qpx * sy - qpy * sx, denom)
+        u = Fraction(qpx * ry - qpy * rx, denom)
+        if 0 <= t <= 1 and 0 <= u <= 1:
+            return True, (self.x + t * rx, self.y + t * ry)
         else:
             return False, None
 
     def get_key(self):
-        return self.y
+        """
+        Order on the sweep line: y at the sweep x, and right of an
+        intersection the steeper segment is the upper one
+        """
+        return self.y_at(Coord.sweep_x), self.slope()
 
 
 class AVL:
@@ -118,20 +146,6 @@ class AVL:
     def __init__(self, root):
         self.root = root
 
-    def recalculate_height(self, subtree):
-        """
-        Bottom up re-calculation of height
-        """
-        if subtree is None:
-            return -1
-
-        h_l = self.recalculate_height(subtree.left)
-        h_r = self.recalculate_height(subtree.right)
-
-        height = max(h_l, h_r) + 1
-        subtree.height = height
-        return height
-
     def balance_factor(self, node):
         h_l = -1
         h_r = -1
@@ -142,28 +156,15 @@ class AVL:
 
         return h_l - h_r
 
-    def is_balanced(self, node):
-        """
-        Bottom up check to determine if AVL is 
-        balanced or not
-        """
-        if node is None:
-            return True, None
-
-        balance_factor = self.balance_factor(node)
-        if balance_factor < -1 or \
-                balance_factor > 1:
-            return False, node
-
-        return self.is_balanced(node.parent)
-
     def check_orientation(self, unbal_node):
         bf = self.balance_factor(unbal_node)
         orientation = []
         if bf < -1:
             orientation.append('R')
             bf_r = self.balance_factor(unbal_node.right)
-            if bf_r <= -1:
+            # a balanced child (possible after a delete) needs a
+            # single rotation, a double one would leave it unbalanced
+            if bf_r <= 0:
                 orientation.append('R')
             else:
                 orientation.append('L')
@@ -178,17 +179,38 @@ class AVL:
         return ''.join(orientation)
 
     def rotate(self, unbal_node):
+        """
+        Rotates the unbalanced node and returns the root of the
+        rotated subtree
+        """
         orientation = self.check_orientation(unbal_node)
         if orientation == 'LL':
-            self.rotate_right(unbal_node)
+            return self.rotate_right(unbal_node)
         elif orientation == 'RR':
-            self.rotate_left(unbal_node)
+            return self.rotate_left(unbal_node)
         elif orientation == 'LR':
             self.rotate_left(unbal_node.left)
-            self.rotate_right(unbal_node)
+            return self.rotate_right(unbal_node)
         else:
             self.rotate_right(unbal_node.right)
-            self.rotate_left(unbal_node)
+            return self.rotate_left(unbal_node)
+
+    def update_height(self, node):
+        h_l = -1 if node.left is None else node.left.height
+        h_r = -1 if node.right is None else node.right.height
+        node.height = max(h_l, h_r) + 1
+
+    def rebalance(self, node):
+        """
+        Walks up from node fixing heights and rotating unbalanced
+        nodes. Only the O(log n) nodes on the path are touched
+        """
+        while node is not None:
+            self.update_height(node)
+            bf = self.balance_factor(node)
+            if bf < -1 or bf > 1:
+                node = self.rotate(node)
+            node = node.parent
 
     def rotate_left(self, node):
         parent = node.parent
@@ -213,6 +235,10 @@ class AVL:
         else:
             self.root = new_root
 
+        self.update_height(node)
+        self.update_height(new_root)
+        return new_root
+
     def rotate_right(self, node):
         parent = node.parent
         new_root = node.left
@@ -236,89 +262,99 @@ class AVL:
         else:
             self.root = new_root
 
+        self.update_height(node)
+        self.update_height(new_root)
+        return new_root
+
     def insert(self, subtree, new_node):
         """
-        Inserts given new node in the given subtree
+        Inserts given new node in the given subtree. Equal keys go
+        to the right
         """
-        if subtree is not None and \
-                new_node.get_key() > subtree.get_key():
-            if subtree.right is None:
-                subtree.right = new_node
-                new_node.parent = subtree
-                self.recalculate_height(self.root)
-                balanced, unbal_node = self.is_balanced(subtree)
-                if not balanced:
-                    self.rotate(unbal_node)
-                    self.recalculate_height(self.root)
-            else:
-                self.insert(subtree.right, new_node)
-        elif subtree is not None and \
-                new_node.get_key() < subtree.get_key():
-            if subtree.left is None:
-                subtree.left = new_node
-                new_node.parent = subtree
-                self.recalculate_height(self.root)
-                balanced, unbal_node = self.is_balanced(subtree)
-                if not balanced:
-                    self.rotate(unbal_node)
-                    self.recalculate_height(self.root)
-            else:
-                self.insert(subtree.left, new_node)
-        else:
-            # probably, inserting new root
+        new_node.parent = None
+        new_node.left = None
+        new_node.right = None
+        new_node.height = 0
+        if subtree is None:
             self.root = new_node
+            return
+
+        key = new_node.get_key()
+        while True:
+            if key < subtree.get_key():
+                if subtree.left is None:
+                    subtree.left = new_node
+                    break
+                subtree = subtree.left
+            else:
+                if subtree.right is None:
+                    subtree.right = new_node
+                    break
+                subtree = subtree.right
+
+        new_node.parent = subtree
+        self.rebalance(subtree)
+
+    def swap(self, a, b):
+        """
+        Exchanges the places of nodes a and b in the tree, e.g. two
+        segments crossing each other. The nodes themselves (not their
+        contents) move, so references to them stay valid
+        """
+        def other(node):
+            if node is a:
+                return b
+            if node is b:
+                return a
+            return node
+
+        a_links = (a.parent, a.left, a.right, a.height)
+        b_links = (b.parent, b.left, b.right, b.height)
+        a.parent, a.left, a.right = [other(n) for n in b_links[:3]]
+        b.parent, b.left, b.right = [other(n) for n in a_links[:3]]
+        a.height, b.height = b_links[3], a_links[3]
+
+        for node, old in ((a, b), (b, a)):
+            for child in (node.left, node.right):
+                if child is not None:
+                    child.parent = node
+            parent = node.parent
+            if parent is None:
+                self.root = node
+            elif parent is not a and parent is not b:
+                if parent.left is old:
+                    parent.left = node
+                elif parent.right is old:
+                    parent.right = node
 
     def delete(self, del_node):
         """
-        Deletes given node from AVL tree
+        Deletes given node from AVL tree. A node with both children
+        first swaps places with its successor, which has no left
+        child, so that every node can be unlinked directly
         """
-        parent = del_node.parent
-        if del_node.left is None and \
-                del_node.right is None:
-            if del_node == self.root:
-                self.root = None
-            elif parent.left == del_node:
-                parent.left = None
-            else:
-                parent.right = None
-            del del_node
-        elif del_node.left is None and \
+        if del_node.left is not None and \
                 del_node.right is not None:
-            if del_node == self.root:
-                self.root = None
-            elif parent.left == del_node:
-                parent.left = del_node.right
-            else:
-                parent.right = del_node.right
-            del_node.right.parent = parent
-            del del_node
-        elif del_node.left is not None and \
-                del_node.right is None:
-            if del_node == self.root:
-                self.root = None
-            elif parent.left == del_node:
-                parent.left = del_node.left
-            else:
-                parent.right = del_node.left
-            del_node.left.parent = parent
-            del del_node
+            self.swap(del_node, self.min(del_node.right))
+
+        child = del_node.left
+        if child is None:
+            child = del_node.right
+
+        parent = del_node.parent
+        if child is not None:
+            child.parent = parent
+        if parent is None:
+            self.root = child
+        elif parent.left == del_node:
+            parent.left = child
         else:
-            # both child of del node exists
-            succ = self.successor(del_node)
-            # copy contents
-            del_node.x = succ.x
-            del_node.y = succ.y
-            del_node.otherCoord.x = succ.otherCoord.x
-            del_node.otherCoord.y = succ.otherCoord.y
-            # succ may have right subtree
-            # but never left subtree
-            self.delete(succ)
-
-        self.recalculate_height(self.root)
-        balanced, unbal_node = self.is_balanced(parent)
-        if not balanced:
-            self.rotate(unbal_node)
-            self.recalculate_height(self.root)
+            parent.right = child
+
+        del_node.parent = None
+        del_node.left = None
+        del_node.right = None
+        self.rebalance(parent)
 
     def min(self, node):
         while node.left is not None:
@@ -359,6 +395,190 @@ class AVL:
                 return curr.parent
 
 
+def _segments_through(tree, x, y):
+    """
+    Returns the segments on the sweep line passing through (x, y),
+    bottom to top. They are neighbours in the tree
+    """
+    curr = tree.root
+    while curr is not None:
+        y_curr = curr.y_at(x)
+        if y_curr < y:
+            curr = curr.right
+        elif y_curr > y:
+            curr = curr.left
+        else:
+            break
+    if curr is None:
+        return list()
+
+    below = list()
+    node = tree.predecessor(curr)
+    while node is not None and node.y_at(x) == y:
+        below.append(node)
+        node = tree.predecessor(node)
+    above = list()
+    node = tree.successor(curr)
+    while node is not None and node.y_at(x) == y:
+        above.append(node)
+        node = tree.successor(node)
+    return below[::-1] + [curr] + above
+
+
+def _neighbours(tree, x, y):
+    """
+    Returns the segments just below and just above (x, y) on the
+    sweep line, when none passes through it
+    """
+    below = above = None
+    curr = tree.root
+    while curr is not None:
+        if curr.y_at(x) < y:
+            below = curr
+            curr = curr.right
+        else:
+            above = curr
+            curr = curr.left
+    return below, above
+
+
+def find_intersections(all_coords):
+    """
+    Bentley-Ottmann sweep over the side tagged end points of the
+    line segments. Returns a list of (x, y, coord, coord_other), one
+    per intersecting pair of segments, where the coords are the left
+    ends of the two segments.
+
+    Every event point p is handled at once, whatever number of
+    segments meet there: the ones starting at p, ending at p and
+    containing p are all reported pairwise. Then the ones ending at
+    or containing p are taken out and the ones starting at or
+    containing p are put back in, which inserts them in the order
+    right of p, i.e. reverses the crossing segments
+    """
+    # left ends of the segments starting at every end point
+    starts = dict()
+    events = list()
+    for coord in all_coords:
+        point = (coord.x, coord.y)
+        if point not in starts:
+            starts[point] = list()
+            events.append(point)
+        if coord.side == Side.LEFT:
+            starts[point].append(coord)
+    heapq.heapify(events)
+    queued = set(events)
+
+    tree = AVL(None)
+    intersections = list()
+
+    def schedule(lower, upper, point):
+        if lower is None or upper is None:
+            return
+        is_intersecting, intersection_pt = lower.check_intersection(upper)
+        # only points right of the sweep line (or on it, above the
+        # current point) are still ahead
+        if is_intersecting and intersection_pt > point and \
+                intersection_pt not in queued:
+            queued.add(intersection_pt)
+            heapq.heappush(events, intersection_pt)
+
+    while events:
+        point = heapq.heappop(events)
+        queued.discard(point)
+        x, y = point
+        Coord.sweep_x = x
+
+        upper = starts.get(point, list())
+        through = _segments_through(tree, x, y)
+        # segments passing through the point, not just ending there
+        crossing = [s for s in through if s.otherCoord.x != x]
+
+        # overlapping collinear segments are not reported, like
+        # check_intersection does not report parallel ones
+        meeting = upper + through
+        for i in range(len(meeting)):
+            for j in range(i + 1, len(meeting)):
+                if meeting[i].slope() != meeting[j].slope():
+                    intersections.append((x, y, meeting[i], meeting[j]))
+
+        for segment in through:
+            tree.delete(segment)
+        for segment in upper + crossing:
+            tree.insert(tree.root, segment)
+
+        if not upper and not crossing:
+            below, above = _neighbours(tree, x, y)
+            schedule(below, above, point)
+            continue
+
+        right_of = sorted(upper + crossing, key=lambda s: s.get_key())
+        lowest = right_of[0]
+        highest = right_of[-1]
+        schedule(tree.predecessor(lowest), lowest, point)
+        schedule(highest, tree.successor(highest), point)
+
+    return intersections
+
+
+def brute_force_intersections(all_coords):
+    """
+    Checks all nc2 pairs of line segments
+    """
+    lefts = [c for c in all_coords if c.side == Side.LEFT]
+    intersections = list()
+    for i in range(len(lefts)):
+        for j in range(i + 1, len(lefts)):
+            is_intersecting, intersection_pt = \
+                lefts[i].check_intersection(lefts[j])
+            if is_intersecting:
+                intersections.append(intersection_pt)
+    return intersections
+
+
+def make_segment(x1, y1, x2, y2):
+    c1 = Coord(x1, y1)
+    c2 = Coord(x2, y2)
+    c1.otherCoord = c2
+    c2.otherCoord = c1
+    c1.assignSideTags()
+    return [c1, c2]
+
+
+def as_number(value):
+    if value.denominator == 1:
+        return int(value)
+    return float(value)
+
+
+def benchmark(n, length=50, space=10 ** 4):
+    """
+    Times the sweep against checking all pairs on n random short
+    segments, for which k stays small
+    """
+    all_coords = list()
+    for _ in range(n):
+        x1 = random.randrange(space)
+        y1 = random.randrange(space)
+        x2 = x1 + random.randint(1, length)
+        y2 = y1 + random.randint(-length, length)
+        all_coords.extend(make_segment(x1, y1, x2, y2))
+
+    start = time.perf_counter()
+    swept = find_intersections(all_coords)
+    sweep_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    brute = brute_force_intersections(all_coords)
+    brute_time = time.perf_counter() - start
+
+    if sorted((x, y) for x, y, _, _ in swept) != sorted(brute):
+        raise Exception("Sweep and brute force found different "
+                        "intersections!")
+    print("n=%d k=%d sweep=%.3fs all pairs=%.3fs"
+          % (n, len(swept), sweep_time, brute_time))
+
+
 def capture_inputs():
     print("Enter number of lines=", end="")
     num_lines = int(input())
@@ -388,60 +608,14 @@ def capture_inputs():
 def main():
     all_coords = capture_inputs()
 
-    # step 1: Sort the lines using their x coordinates
-    # and tag with "left" and "right" ends
-    all_coords_sorted = sorted(all_coords, key=lambda c: c.x)
-
-    # step 2: Move from leftmost x coordinate to next
-    # higher x coordinate
-
-    # step 3: Do "vertical sweep":
-    # 1. If it is left endpoint then check intersection
-    #   with just upper and lower line segments
-    # 2. If it is right endpoint then check intersection
-    #   of just upper and lower line segments since this
-    #   line is now out of active set itself
-    tree = AVL(None)
-    intersection_count = 0
-    intersections = list()
-    for coord in all_coords_sorted:
-        if coord.side == Side.LEFT:
-            tree.insert(tree.root, coord)
-            succ = tree.successor(coord)
-            pred = tree.predecessor(coord)
-            if succ is not None:
-                is_intersecting, intersection_pt = coord.check_intersection(succ)
-                if is_intersecting:
-                    # count as an intersection
-                    intersection_count = intersection_count + 1
-                    intersections.append(intersection_pt)
-
-            if pred is not None:
-                is_intersecting, intersection_pt = coord.check_intersection(pred)
-                if is_intersecting:
-                    # count as an intersection
-                    intersection_count = intersection_count + 1
-                    intersections.append(intersection_pt)
-        else:
-            # delete the coordinate pair representing
-            # this line segment
-            # the right coordinate is never inserted in the tree
-            # only the LEFT pair was inserted and deleted now
-            tree.delete(coord.otherCoord)
-
-            succ = tree.successor(coord)
-            pred = tree.predecessor(coord)
-            if succ is None or pred is None:
-                continue
-
-            is_intersecting, intersection_pt = succ.check_intersection(pred)
-            if is_intersecting:
-                # count as an intersection
-                intersection_count = intersection_count + 1
-                intersections.append(intersection_pt)
+    intersections = find_intersections(all_coords)
+    print("Total Intersections=", len(intersections))
+    print("Intersections=", [(as_number(x), as_number(y))
+                             for x, y, _, _ in intersections])
 
-    print("Total Intersections=", intersection_count)
-    print("Intersections=", intersections)
+    print("Enter number of line segments to benchmark with=", end="")
+    n = int(input())
+    benchmark(n)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+"""
+Binary snapshots of sorted int keys, shared by 5_bst.py and 6_avl.py
+
+    header | n keys as int64 | (n + 1) uint64 offsets | payloads
+
+The header is magic, version, flags and key count. The offsets and
+payload blob are only there when the snapshot was written with
+payloads. Everything is little-endian.
+
+Loading memory maps the file and hands the mapped keys straight to
+a build function (a balanced bulk build for both trees), so nothing
+is re-inserted.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+SNAPSHOT_VERSION = 1
+# magic, version, flags, key count
+SNAPSHOT_HEADER = struct.Struct("<4sBBxxQ")
+SNAPSHOT_HAS_PAYLOADS = 1
+
+
+def save_snapshot(keys, path, magic, payloads=None):
+    """
+    Writes the sorted keys to path. payloads is an optional dict
+    mapping key to bytes
+    """
+    keys = array("q", keys)
+    flags = SNAPSHOT_HAS_PAYLOADS if payloads is not None else 0
+
+    with open(path, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(magic, SNAPSHOT_VERSION,
+                                     flags, len(keys)))
+        if sys.byteorder == "big":
+            keys.byteswap()
+        keys.tofile(f)
+        if sys.byteorder == "big":
+            keys.byteswap()
+
+        if payloads is not None:
+            blobs = [payloads.get(k, b"") for k in keys]
+            offsets = array("Q", [0])
+            for b in blobs:
+                offsets.append(offsets[-1] + len(b))
+            if sys.byteorder == "big":
+                offsets.byteswap()
+            offsets.tofile(f)
+            for b in blobs:
+                f.write(b)
+
+
+def load_snapshot(path, magic, build):
+    """
+    Restores a snapshot written by save_snapshot with the same magic.
+    build(keys) gets the sorted keys as a sequence of ints and
+    returns the tree.
+
+    Returns (tree, payloads) where payloads is None if the snapshot
+    was written without them. Raises on a file of another kind or
+    one whose size does not match its header
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        header = f.read(SNAPSHOT_HEADER.size)
+        if len(header) < SNAPSHOT_HEADER.size:
+            raise Exception("Truncated snapshot file: " + str(path))
+        found, version, flags, n = SNAPSHOT_HEADER.unpack(header)
+        if found != magic or version != SNAPSHOT_VERSION:
+            raise Exception("Not a snapshot file: " + str(path))
+
+        has_payloads = bool(flags & SNAPSHOT_HAS_PAYLOADS)
+        start = SNAPSHOT_HEADER.size
+        end = start + 8 * n
+        blob = end + 8 * (n + 1) if has_payloads else end
+        if size < blob or (not has_payloads and size != end):
+            raise Exception("Truncated snapshot file: " + str(path))
+
+        if size == start:
+            # header only, there are no keys to map
+            return build([]), None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        with memoryview(mm) as view:
+            if sys.byteorder == "little":
+                keys = view[start:end].cast("q")
+            else:
+                keys = array("q")
+                keys.frombytes(view[start:end])
+                keys.byteswap()
+
+            try:
+                tree = build(keys)
+                payloads = None
+                if has_payloads:
+                    payloads = _load_payloads(view, keys, n, end, blob,
+                                              size, path)
+            finally:
+                if isinstance(keys, memoryview):
+                    keys.release()
+    finally:
+        mm.close()
+
+    return tree, payloads
+
+
+def _load_payloads(view, keys, n, end, blob, size, path):
+    offsets = array("Q")
+    offsets.frombytes(view[end:blob])
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    if offsets[0] != 0 or blob + offsets[n] != size or \
+            any(offsets[i] > offsets[i + 1] for i in range(n)):
+        raise Exception("Corrupt snapshot payloads: " + str(path))
+
+    payloads = dict()
+    for i in range(n):
+        payloads[keys[i]] = bytes(view[blob + offsets[i]:blob + offsets[i + 1]])
+    return payloads